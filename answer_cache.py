@@ -0,0 +1,151 @@
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from coalescer import normalize_question
+from db_writer import BatchedWriter
+
+# Force Absolute Path for finding local resources
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+
+class AnswerCache:
+    """Exact-match answer cache: in-memory LRU in front of a SQLite table.
+
+    Keys are (normalized question, model file, system prompt), so switching
+    models or prompts never serves a stale answer. The cache does not look at
+    conversation history, which is why very short questions (usually
+    follow-ups like "and the space?") are never cached.
+
+    Lookups read the LRU, then SQLite (WAL mode, so reads never wait on a
+    write). Inserts and hit bookkeeping are queued for a writer thread that
+    commits whatever has piled up in one transaction, off the generation path.
+    """
+
+    def __init__(self, path=None, memory_entries=256, disk_entries=5000,
+                 max_answer_chars=32000, min_words=3):
+        self.path = path or os.path.join(CACHE_DIR, "answers.db")
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.max_answer_chars = max_answer_chars
+        self.min_words = min_words
+        self.memory = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False) # Reads
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT,
+                model TEXT,
+                answer TEXT,
+                created REAL,
+                last_used REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used)")
+        self.db.commit()
+
+        self.writer = BatchedWriter(self.path, self._write, name="answer-cache", tag="Cache")
+
+    def _key(self, question, model_path, system_prompt):
+        norm = normalize_question(question)
+        if len(norm.split()) < self.min_words:
+            return None
+        model_id = os.path.basename(model_path)
+        return hashlib.sha256(f"{model_id}\0{system_prompt}\0{norm}".encode("utf-8")).hexdigest()
+
+    def get(self, question, model_path, system_prompt):
+        key = self._key(question, model_path, system_prompt)
+        if key is None:
+            return None
+        with self.lock:
+            answer = self.memory.get(key)
+            if answer is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.writer.put(("touch", key, time.time()))
+                return answer
+
+            row = self.db.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            answer = row[0]
+            self.hits += 1
+            self.disk_hits += 1
+            self.writer.put(("touch", key, time.time()))
+            self._remember(key, answer)
+            return answer
+
+    def put(self, question, model_path, system_prompt, answer):
+        key = self._key(question, model_path, system_prompt)
+        if key is None or not answer or len(answer) > self.max_answer_chars:
+            return
+        now = time.time()
+        with self.lock:
+            self._remember(key, answer)
+        self.writer.put(("put", key, question, os.path.basename(model_path), answer, now))
+
+    def _write(self, db, ops):
+        # Runs on the writer thread, in one transaction per batch
+        for op in ops:
+            if op[0] == "put":
+                _, key, question, model, answer, now = op
+                db.execute(
+                    "INSERT OR REPLACE INTO answers (key, question, model, answer, created, last_used, hits) VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, question, model, answer, now, now)
+                )
+            elif op[0] == "touch":
+                db.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?", (op[2], op[1]))
+            elif op[0] == "clear":
+                db.execute("DELETE FROM answers")
+        if any(op[0] == "put" for op in ops):
+            # Evict least recently used rows beyond the disk limit
+            count = db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.disk_entries:
+                excess = count - self.disk_entries
+                db.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+
+    def _remember(self, key, answer):
+        self.memory[key] = answer
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        # Waits for the delete, or get() could still find a cleared answer on disk
+        with self.lock:
+            self.memory.clear()
+            self.writer.put(("clear",))
+            self.writer.flush()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def print_summary(self):
+        print(f"[Cache] {self.hits} hits ({self.disk_hits} from disk), {self.misses} misses, "
+              f"hit rate {self.hit_rate:.0%}, {self.evictions} evicted")
+
+    def close(self):
+        """Writes what is still queued and closes the database."""
+        self.writer.close()
+        with self.lock:
+            self.db.close()
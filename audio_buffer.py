@@ -0,0 +1,209 @@
+import collections
+import threading
+import time
+import numpy as np
+
+class AudioRingBuffer:
+    """Fixed-capacity float32 ring buffer for the live audio path.
+
+    The storage is mirrored (every sample is written at i and i + capacity),
+    so the newest N samples are always one contiguous slice and can be handed
+    to Whisper as a view without np.concatenate. Nothing is allocated after
+    construction, so memory stays flat however long the session runs.
+    """
+
+    def __init__(self, capacity, dtype=np.float32, storage=None):
+        self.capacity = int(capacity)
+        # storage: optional preallocated array of 2 * capacity (e.g. in shared memory)
+        self._data = storage if storage is not None else np.zeros(self.capacity * 2, dtype=dtype)
+        self._scratch = np.zeros(self.capacity, dtype=dtype) # For energy (|x|) without allocating
+        self._write_pos = 0
+        self._length = 0
+
+        # Monotonic counters (samples), never reset
+        self.written = 0    # Total samples written
+        self.overruns = 0   # Samples overwritten before anyone discarded them
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def start_index(self):
+        # Absolute index (in samples written so far) of the oldest buffered sample
+        return self.written - self._length
+
+    def _put(self, pos, src, gain):
+        n = len(src)
+        dst = self._data[pos:pos + n]
+        if gain is None:
+            dst[...] = src
+        else:
+            np.multiply(src, gain, out=dst)
+        # Keep the mirror half in sync
+        self._data[pos + self.capacity:pos + self.capacity + n] = dst
+
+    def write(self, chunk, gain=None):
+        """Append a block, optionally scaled by gain. energy() measures it if needed."""
+        cap = self.capacity
+        m = len(chunk)
+        if m == 0:
+            return
+        if m > cap:
+            # Block larger than the whole ring: only the newest part fits
+            self.overruns += m - cap
+            self.written += m - cap
+            chunk = chunk[-cap:]
+            m = cap
+
+        p = self._write_pos
+        first = min(m, cap - p)
+        self._put(p, chunk[:first], gain)
+        if m > first:
+            self._put(0, chunk[first:], gain)
+
+        self._write_pos = (p + m) % cap
+        overflow = self._length + m - cap
+        if overflow > 0:
+            self.overruns += overflow
+        self._length = min(cap, self._length + m)
+        self.written += m
+
+    def energy(self, n=None):
+        """Mean absolute amplitude of the newest n samples, computed in place."""
+        v = self.view(n)
+        if len(v) == 0:
+            return 0.0
+        scratch = self._scratch[:len(v)]
+        np.abs(v, out=scratch)
+        return float(scratch.mean())
+
+    def view(self, n=None):
+        """Contiguous, zero-copy view of the newest n samples (default: all)."""
+        if n is None or n > self._length:
+            n = self._length
+        start = (self._write_pos - n) % self.capacity
+        return self._data[start:start + n]
+
+    def discard(self, n):
+        """Drop the oldest n samples."""
+        self._length -= max(0, min(int(n), self._length))
+
+    def keep_last(self, n):
+        """Drop everything except the newest n samples (pre-roll)."""
+        if self._length > n:
+            self.discard(self._length - n)
+
+    def clear(self):
+        self._length = 0
+
+
+class BlockQueue:
+    """Bounded FIFO of fixed-size mono blocks in preallocated slots.
+
+    The recorder thread downmixes straight into a free slot, and get() hands
+    out a view of the slot that stays valid until the next get(). When the
+    queue is full, "drop_oldest" discards the oldest queued block so latency
+    stays bounded, and "block" makes the recorder wait so nothing is lost
+    here. With "block" the device buffer overruns instead.
+    """
+
+    def __init__(self, block_size, capacity=16, policy="drop_oldest"):
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.block_size = block_size
+        self.capacity = capacity
+        self.policy = policy
+        # One extra slot: the block the consumer is holding is never overwritten
+        self._slots = np.zeros((capacity + 1, block_size), dtype=np.float32)
+        self._lengths = np.zeros(capacity + 1, dtype=np.int64)
+        self._times = np.zeros(capacity + 1, dtype=np.float64) # perf_counter() when each block was put
+        self._free = collections.deque(range(capacity + 1))
+        self._queued = collections.deque()
+        self._held = None
+        self.held_time = None # perf_counter() at which the block returned by get() was put
+        self._cond = threading.Condition()
+        self.closed = False
+
+        # Counters
+        self.blocks_in = 0
+        self.overruns = 0        # Times a block arrived with the queue full
+        self.dropped_frames = 0  # Frames discarded by drop_oldest
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return len(self._queued)
+
+    def empty(self):
+        return not self._queued
+
+    def _full(self):
+        return not self._free or len(self._queued) >= self.capacity
+
+    def put(self, data, t=None):
+        """Downmix data (frames, channels) or (frames,) into a slot. False if closed.
+
+        t: when the block was recorded (perf_counter()); defaults to now.
+        """
+        if t is None:
+            t = time.perf_counter()
+        with self._cond:
+            if self._full():
+                self.overruns += 1
+            while self._full() and not self.closed:
+                if self.policy == "block":
+                    self._cond.wait()
+                else:
+                    self.dropped_frames += int(self._lengths[self._queued[0]])
+                    self._free.append(self._queued.popleft())
+            if self.closed:
+                return False
+            slot = self._free.popleft()
+
+        # The slot is ours until it is queued: no lock needed to fill it
+        n = min(len(data), self.block_size)
+        out = self._slots[slot, :n]
+        if data.ndim == 1:
+            out[...] = data[:n]
+        elif data.shape[1] == 1:
+            out[...] = data[:n, 0]
+        else:
+            np.mean(data[:n], axis=1, out=out)
+        self._lengths[slot] = n
+        self._times[slot] = t
+
+        with self._cond:
+            self._queued.append(slot)
+            self.blocks_in += 1
+            self.max_depth = max(self.max_depth, len(self._queued))
+            self._cond.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """Oldest block as a view (valid until the next get()).
+
+        Waits for one, at most `timeout` seconds if given. None on timeout, or
+        once the queue is closed and drained.
+        """
+        with self._cond:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._queued or self.closed, timeout):
+                return None
+            if not self._queued:
+                return None
+            self._held = self._queued.popleft()
+            self._cond.notify_all() # A "block" put may be waiting for queue room
+            self.held_time = float(self._times[self._held])
+            return self._slots[self._held, :self._lengths[self._held]]
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {"blocks": self.blocks_in, "overruns": self.overruns, "dropped_frames": self.dropped_frames,
+                "depth": self.depth, "max_depth": self.max_depth}
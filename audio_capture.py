@@ -1,16 +1,25 @@
 import soundcard as sc
-import numpy as np
 import threading
-import queue
 import time
 
+from audio_buffer import BlockQueue
+
 class AudioCapture:
-    def __init__(self, sample_rate=16000, block_size=4096):
+    # Low-latency mode: 20 ms blocks instead of 256 ms (see AudioWorker)
+    LOW_LATENCY_BLOCK_SIZE = 320
+    SILENCE_WARNING_SECONDS = 5.0 # Pure digital silence this long suggests a muted device
+
+    def __init__(self, sample_rate=16000, block_size=4096, queue_seconds=4.0, overflow="drop_oldest"):
         self.sample_rate = sample_rate
         self.block_size = block_size
-        self.audio_queue = queue.Queue()
+        # Bounded and preallocated: if STT stalls, at most queue_seconds of audio
+        # wait here; overflow is "drop_oldest" (bounded latency) or "block"
+        queue_blocks = max(2, int(queue_seconds * sample_rate / block_size))
+        self.audio_queue = BlockQueue(block_size, capacity=queue_blocks, policy=overflow)
         self.running = False
         self.thread = None
+        self.block_time = None # perf_counter() when the last block from get_audio_chunk() was recorded
+        self.error = None      # Why recording stopped, if it failed
         self.mic = self._get_loopback_mic()
 
     def _get_loopback_mic(self):
@@ -53,39 +62,54 @@ class AudioCapture:
 
     def _record_loop(self):
         print(f"Starting recording on: {self.mic.name}")
-        consecutive_silence_count = 0
+        silent_samples = 0 # Counted in samples, so the warning waits as long at any block size
+        warn_samples = int(self.SILENCE_WARNING_SECONDS * self.sample_rate)
         try:
             with self.mic.recorder(samplerate=self.sample_rate) as recorder:
                 while self.running:
                     data = recorder.record(numframes=self.block_size)
+                    recorded = time.perf_counter() # Queueing delay downstream counts from here
                     # data is (numframes, channels) float32
-                    # flatten to mono
-                    if data.shape[1] > 1:
-                        data = np.mean(data, axis=1)
-                    else:
-                        data = data.flatten()
                     
                     # Check for silence (all zeros) distinct from just quiet
-                    max_val = np.max(np.abs(data))
-                    if max_val == 0:
-                       consecutive_silence_count += 1
-                       if consecutive_silence_count == 20: # Approx 5 seconds at 4096/16000 (~0.25s per block)
-                           print("[WARNING] Microphone is returning pure silence (0.0). Check mute switch or privacy settings!")
+                    if not data.any():
+                        # Fires once, when the silence reaches SILENCE_WARNING_SECONDS
+                        if silent_samples < warn_samples <= silent_samples + len(data):
+                            print("[WARNING] Microphone is returning pure silence (0.0). Check mute switch or privacy settings!")
+                        silent_samples += len(data)
                     else:
-                        consecutive_silence_count = 0
+                        silent_samples = 0
                     
-                    self.audio_queue.put(data)
+                    # Downmixed to mono straight into a preallocated slot
+                    overruns = self.audio_queue.overruns
+                    if not self.audio_queue.put(data, recorded):
+                        break # Closed by stop()
+                    if self.audio_queue.overruns != overruns and self.audio_queue.overruns % 20 == 1:
+                        print(f"[Audio] Capture queue full ({self.audio_queue.policy}): "
+                              f"{self.audio_queue.overruns} overruns, {self.audio_queue.dropped_frames} frames dropped")
         except Exception as e:
             print(f"[Audio] Recording Error: {e}")
+            self.error = str(e)
+        finally:
             self.running = False
+            self.audio_queue.close() # End of stream: get_audio_chunk() returns None instead of waiting
 
     def stop(self):
         self.running = False
+        self.audio_queue.close() # Wakes the recorder if it waits on a full queue
         if self.thread:
             self.thread.join()
+            s = self.stats()
+            print(f"[Audio] Capture: {s['blocks']} blocks, {s['overruns']} overruns, "
+                  f"{s['dropped_frames']} frames dropped, max queue depth {s['max_depth']}/{self.audio_queue.capacity}")
+
+    def stats(self):
+        # Counters for overruns, dropped frames and queue depth
+        return self.audio_queue.stats()
 
     def get_audio_chunk(self):
-        try:
-            return self.audio_queue.get_nowait()
-        except queue.Empty:
-            return None
+        # Waits for the next block; a view into the queue's slot, valid until the next call.
+        # None once stop() has closed the queue, or the recorder failed (see self.error)
+        chunk = self.audio_queue.get()
+        self.block_time = self.audio_queue.held_time
+        return chunk
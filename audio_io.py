@@ -0,0 +1,61 @@
+import numpy as np
+import wave
+
+try:
+    import soundfile as sf
+    HAS_SOUNDFILE = True
+except ImportError:
+    HAS_SOUNDFILE = False
+
+def _read_wav(path):
+    # Stdlib fallback: PCM WAV only (8/16/32-bit integer)
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bit")
+
+    return data.reshape(-1, channels), rate
+
+def load_audio(path, sample_rate=16000):
+    """Read a WAV/FLAC file as mono float32 at sample_rate."""
+    if HAS_SOUNDFILE:
+        data, rate = sf.read(path, dtype="float32", always_2d=True)
+    elif path.lower().endswith(".wav"):
+        data, rate = _read_wav(path)
+    else:
+        raise ImportError("Please install soundfile to read non-WAV audio files.")
+
+    # Downmix to mono (same as AudioCapture)
+    if data.shape[1] > 1:
+        data = np.mean(data, axis=1)
+    else:
+        data = data[:, 0]
+
+    if rate != sample_rate and len(data) > 0:
+        # Linear resampling is plenty for VAD/STT test fixtures
+        n_out = int(round(len(data) * sample_rate / rate))
+        x_old = np.arange(len(data)) / rate
+        x_new = np.arange(n_out) / sample_rate
+        data = np.interp(x_new, x_old, data)
+
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+def load_labels(path):
+    """Read Audacity-style labels ("start<TAB>end[<TAB>label]") as [(start, end)] seconds."""
+    segments = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) >= 2:
+                segments.append((float(parts[0]), float(parts[1])))
+    return segments
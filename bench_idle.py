@@ -0,0 +1,112 @@
+"""Idle benchmark: CPU and wakeups while nobody speaks, and per-block hand-off delay.
+
+Loads the real models, feeds the listener silent blocks at device pace (a
+quiet microphone), lets everything settle and then measures for a while:
+
+    python bench_idle.py --seconds 30 --speculate prefill
+
+Wakeups are voluntary context switches of the whole process (psutil, or
+resource on Unix); the silent source itself accounts for one per block.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+from latency import tracer
+from pipeline import Listener, Thinker, Pipeline
+
+class SilentSource:
+    """Zero blocks at real-time pace; records how long each waited before the listener took it."""
+
+    def __init__(self, sample_rate=16000, block_size=4096):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.audio_queue = queue.Queue()
+        self.running = False
+        self.thread = None
+        self.delays = []
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._play_loop, daemon=True)
+        self.thread.start()
+
+    def _play_loop(self):
+        block = np.zeros(self.block_size, dtype=np.float32)
+        next_time = time.perf_counter()
+        while self.running:
+            next_time += self.block_size / self.sample_rate
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.audio_queue.put((time.perf_counter(), block))
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.audio_queue.put(None)
+
+    def get_audio_chunk(self):
+        item = self.audio_queue.get()
+        if item is None:
+            return None
+        put_time, block = item
+        self.delays.append(time.perf_counter() - put_time)
+        return block
+
+def context_switches():
+    if HAS_PSUTIL:
+        return psutil.Process().num_ctx_switches().voluntary
+    if HAS_RESOURCE:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure idle CPU, wakeups and block hand-off delay.")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--model", default=os.path.join("local_models", "qwen2.5-coder-3b-instruct-q4_k_m.gguf"))
+    parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--block-ms", type=float, default=256.0, help="Capture block length; 20 = low-latency mode")
+    parser.add_argument("--speculate", default="off", choices=["off", "prefill", "answer"])
+    args = parser.parse_args()
+
+    tracer.enabled = False
+    source = SilentSource(block_size=int(16000 * args.block_ms / 1000))
+    thinker = None if args.no_llm else Thinker(model_path=args.model, speculate=args.speculate)
+    pipeline = Pipeline(Listener(audio_source=source), thinker)
+    ready = threading.Event()
+    pipeline.subscribe(lambda event, *a: event == "status_update" and a[0] == "Listening..." and ready.set())
+    pipeline.start()
+    ready.wait()
+    time.sleep(2.0) # Let warm-up leftovers and the first idle work finish
+
+    source.delays.clear()
+    cpu0, switches0 = time.process_time(), context_switches()
+    time.sleep(args.seconds)
+    cpu, switches = time.process_time() - cpu0, context_switches()
+    delays = np.array(source.delays) * 1000.0
+    pipeline.stop()
+
+    print()
+    print(f"[Bench] Idle for {args.seconds:.0f}s ({args.block_ms:.0f} ms blocks, speculate={args.speculate})")
+    print(f"        CPU       {cpu / args.seconds * 1000:8.2f} ms per second")
+    if switches is not None:
+        print(f"        Wakeups   {(switches - switches0) / args.seconds:8.1f} per second (voluntary context switches)")
+    if len(delays):
+        print(f"        Hand-off  mean {delays.mean():6.2f} ms, p95 {np.percentile(delays, 95):6.2f} ms, "
+              f"max {delays.max():6.2f} ms (block ready -> listener)")
@@ -0,0 +1,141 @@
+"""End-to-end latency benchmark: replays audio files through AudioWorker -> LLMWorker.
+
+Reports, per utterance, speech end -> transcript and transcript -> first
+token. Runs headless (no overlay window):
+
+    python bench_latency.py recordings/ --fast
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+from PyQt6.QtCore import QCoreApplication, Qt
+
+from file_capture import FileAudioCapture
+from main import AudioWorker, LLMWorker
+from latency import tracer
+
+class LatencyProbe:
+    def __init__(self, audio_worker, llm_worker=None):
+        self.audio_worker = audio_worker
+        self.llm_worker = llm_worker
+        self.utterances = []
+        self.by_uid = {}
+        self.current = None
+        self.lock = threading.Lock()
+
+    # Audio thread
+    def on_text(self, text, uid):
+        now = time.perf_counter()
+        if len(text) <= 2: # Same filter as bridge_audio_to_llm
+            return
+        u = {"text": text, "speech_end": self.audio_worker.last_voice_time, "transcript": now,
+             "first_token": None, "done": None}
+        with self.lock:
+            self.utterances.append(u)
+            self.by_uid[uid] = u
+        if self.llm_worker:
+            self.llm_worker.add_question(text, uid)
+
+    # LLM thread
+    def on_started(self, uid):
+        with self.lock:
+            self.current = self.by_uid.get(uid)
+
+    def on_token(self, token):
+        u = self.current
+        if u is not None and u["first_token"] is None:
+            u["first_token"] = time.perf_counter()
+
+    def on_response(self, _):
+        u = self.current
+        if u is not None:
+            u["done"] = time.perf_counter()
+            self.current = None
+
+def ms(a, b):
+    return (b - a) * 1000.0 if a is not None and b is not None else None
+
+def summarize(name, values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return f"{name:<24} n=0"
+    p50, p95 = np.percentile(values, [50, 95])
+    return f"{name:<24} n={len(values):<4} mean={np.mean(values):8.1f} ms  p50={p50:8.1f} ms  p95={p95:8.1f} ms  max={max(values):8.1f} ms"
+
+def run_thread(target):
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    return t
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay audio through the pipeline and report latencies.")
+    parser.add_argument("path", help="WAV/FLAC file or a folder of them")
+    parser.add_argument("--fast", action="store_true", help="Replay as fast as possible instead of real time")
+    parser.add_argument("--model", default=os.path.join("local_models", "qwen2.5-coder-3b-instruct-q4_k_m.gguf"))
+    parser.add_argument("--no-llm", action="store_true", help="Only measure speech end -> transcript")
+    parser.add_argument("--vad", default="energy", choices=["energy", "silero"])
+    parser.add_argument("--block-ms", type=float, default=256.0, help="Capture block length; 20 = low-latency mode")
+    parser.add_argument("--policy", default="preempt", choices=["preempt", "queue"], help="LLMWorker policy for overlapping questions")
+    parser.add_argument("--speculate", default="off", choices=["off", "prefill", "answer"], help="Work on stable partial transcripts before the speaker stops")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv) # No display needed; signals use direct connections below
+    tracer.enabled = False # Keep benchmark runs out of the deployment latency log
+
+    source = FileAudioCapture(args.path, realtime=not args.fast, block_size=int(16000 * args.block_ms / 1000))
+    # Small blocks stand for low-latency mode, which also shortens the VAD hangover
+    audio_worker = AudioWorker(vad_backend=args.vad, audio_source=source, low_latency=args.block_ms < 100)
+    llm_worker = None if args.no_llm else LLMWorker(model_path=args.model, policy=args.policy, speculate=args.speculate)
+    probe = LatencyProbe(audio_worker, llm_worker)
+
+    direct = Qt.ConnectionType.DirectConnection
+    audio_worker.utterance_ready.connect(probe.on_text, direct)
+    audio_worker.status_update.connect(lambda s: print(f"[Audio] {s}"), direct)
+
+    threads = []
+    llm_failed = [False]
+    if llm_worker:
+        llm_ready = threading.Event()
+        def on_llm_status(status):
+            if status == "LLM Ready" or status.startswith("LLM Error"):
+                llm_failed[0] = status.startswith("LLM Error")
+                llm_ready.set()
+        llm_worker.status_update.connect(on_llm_status, direct)
+        llm_worker.generation_started.connect(probe.on_started, direct)
+        llm_worker.token_ready.connect(probe.on_token, direct)
+        llm_worker.response_ready.connect(probe.on_response, direct)
+        audio_worker.partial_ready.connect(llm_worker.add_partial, direct)
+        threads.append(run_thread(llm_worker.run))
+        # Load the LLM first so the first answer is not stuck behind model loading
+        llm_ready.wait()
+
+    # AudioWorker loads Whisper, then starts the file source itself
+    audio_thread = run_thread(audio_worker.run)
+    threads.append(audio_thread)
+
+    # The worker returns once the files have run out and the last utterance is transcribed
+    audio_thread.join()
+    if llm_worker and not llm_failed[0]:
+        llm_worker.queue.join() # Includes the answer being generated
+
+    audio_worker.stop()
+    if llm_worker:
+        llm_worker.stop()
+    for t in threads:
+        t.join(timeout=5)
+
+    print()
+    print(f"{'#':>3} {'speech->text':>13} {'text->token':>12}  text")
+    for i, u in enumerate(probe.utterances):
+        stt_ms = ms(u["speech_end"], u["transcript"])
+        ttft_ms = ms(u["transcript"], u["first_token"])
+        stt_s = f"{stt_ms:10.1f} ms" if stt_ms is not None else f"{'-':>13}"
+        ttft_s = f"{ttft_ms:9.1f} ms" if ttft_ms is not None else f"{'-':>12}"
+        print(f"{i:>3} {stt_s} {ttft_s}  {u['text'][:60]}")
+    print()
+    print(summarize("speech end -> transcript", [ms(u["speech_end"], u["transcript"]) for u in probe.utterances]))
+    if llm_worker:
+        print(summarize("transcript -> 1st token", [ms(u["transcript"], u["first_token"]) for u in probe.utterances]))
@@ -0,0 +1,84 @@
+"""Overlay benchmark: UI-thread CPU time per streamed token.
+
+Streams a synthetic answer into an offscreen TransparentOverlay at a fixed
+token rate, once inserting every token as plain text as it arrives (the old
+behavior, no Markdown parsing) and once through the frame-coalesced
+stream_token path, which also formats Markdown blocks as they close:
+
+    python bench_overlay.py --tokens 2000 --rate 60
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QTimer, QEventLoop
+from PyQt6.QtWidgets import QApplication
+
+from overlay import TransparentOverlay
+
+WORDS = ("def", " binary", "_search", "(arr", ",", " target", "):\n", "    lo", ",", " hi", " =", " 0", ",",
+         " len", "(arr", ")", " -", " 1", "\n", "    while", " lo", " <=", " hi", ":\n", "        mid", " =",
+         " (lo", " +", " hi", ")", " //", " 2", "\n", " The", " loop", " halves", " the", " range", ".")
+
+def run(window, mode, n_tokens, rate):
+    # Same starting document for both modes
+    window.page_live.clear()
+    window.history_model.clear()
+    window.start_streaming_message("AI")
+    draws = [0]
+    window.tokens_rendered.connect(lambda: draws.__setitem__(0, draws[0] + 1))
+
+    if mode == "per-token":
+        def feed(token):
+            # Plain insert into the live bubble and the history row, bypassing window.markdown
+            window.current_stream_content += token
+            window.live_frame.lastCursorPosition().insertText(token, window.stream_fmt)
+            window.page_live.verticalScrollBar().setValue(window.page_live.verticalScrollBar().maximum())
+            window.history_model.append_text(window.hist_row, token)
+            draws[0] += 1
+    else:
+        feed = window.stream_token
+
+    loop = QEventLoop()
+    timer = QTimer()
+    timer.setInterval(max(1, round(1000 / rate)))
+    sent = [0]
+
+    def tick():
+        feed(WORDS[sent[0] % len(WORDS)])
+        sent[0] += 1
+        if sent[0] >= n_tokens:
+            timer.stop()
+            QTimer.singleShot(window.FLUSH_INTERVAL_MS * 2, loop.quit) # Let the last frame land
+
+    timer.timeout.connect(tick)
+    cpu0, wall0 = time.thread_time(), time.perf_counter()
+    timer.start()
+    loop.exec()
+    cpu, wall = time.thread_time() - cpu0, time.perf_counter() - wall0
+
+    window.tokens_rendered.disconnect()
+    if mode == "per-token":
+        window.live_frame = None # The parser saw none of it; leave the raw text alone
+    window.end_streaming_message()
+    return cpu, wall, draws[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure UI-thread time per streamed token in the overlay.")
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=50.0, help="Tokens per second fed to the overlay")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    window = TransparentOverlay()
+    window.show()
+    app.processEvents()
+
+    print(f"[Bench] {args.tokens} tokens at {args.rate:.0f} tokens/s, platform {app.platformName()}")
+    for mode in ("per-token", "coalesced"):
+        cpu, wall, draws = run(window, mode, args.tokens, args.rate)
+        print(f"[Bench] {mode:<10} UI thread {cpu * 1000:8.1f} ms CPU, {cpu / args.tokens * 1e6:7.1f} us/token, "
+              f"{draws} draws over {wall:.1f}s")
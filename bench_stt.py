@@ -0,0 +1,81 @@
+"""STT benchmark: real-time factor of sequential vs batched transcription.
+
+Every WAV/FLAC file is transcribed whole, once through the sequential path
+and once split at pauses and batched. Long recordings (30 s and up) show
+the difference best. With --preview-model the preview tier (greedy) is
+timed as well, next to the final tier:
+
+    python bench_stt.py recordings/ --model small --batch-size 8 --preview-model base
+"""
+import argparse
+import glob
+import os
+import time
+from difflib import SequenceMatcher
+
+from audio_io import load_audio
+from stt import SpeechToText, HAS_BATCHED_PIPELINE
+
+def find_files(path):
+    if os.path.isdir(path):
+        return sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith((".wav", ".flac")))
+    return [path]
+
+def timed(fn, audio, repeat):
+    best, text = None, ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = fn(audio)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+def word_similarity(a, b):
+    return SequenceMatcher(None, a.lower().split(), b.lower().split()).ratio()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential and batched Whisper transcription.")
+    parser.add_argument("path", help="WAV/FLAC file or a folder of them")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--preview-model", default=None, help="Also time this model as the preview tier")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="Worker pool size when the batched pipeline is unavailable")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per file; the fastest one counts")
+    args = parser.parse_args()
+
+    stt = SpeechToText(model_size=args.model, preview_model_size=args.preview_model,
+                       batch_size=args.batch_size, workers=args.workers)
+    mode = "BatchedInferencePipeline" if HAS_BATCHED_PIPELINE else f"worker pool ({args.workers})"
+    print(f"[Bench] Batched mode: {mode}")
+
+    # Warm up so the first file does not pay for lazy initialization
+    stt.transcribe(load_audio(find_files(args.path)[0], stt.SAMPLE_RATE)[:stt.SAMPLE_RATE], batched=False)
+
+    total_audio = total_seq = total_batch = total_preview = 0.0
+    print(f"{'file':<32} {'audio':>8} {'seq RTF':>8} {'batch RTF':>10} {'speedup':>8} {'same text':>10}"
+          + (f" {'preview RTF':>12} {'preview WA':>11}" if stt.has_preview_tier else ""))
+    for path in find_files(args.path):
+        audio = load_audio(path, stt.SAMPLE_RATE)
+        duration = len(audio) / stt.SAMPLE_RATE
+        seq_time, seq_text = timed(lambda a: stt.transcribe(a, batched=False), audio, args.repeat)
+        batch_time, batch_text = timed(stt.transcribe_batched, audio, args.repeat)
+
+        total_audio += duration
+        total_seq += seq_time
+        total_batch += batch_time
+        line = (f"{os.path.basename(path)[:32]:<32} {duration:7.1f}s {seq_time / duration:8.3f} {batch_time / duration:10.3f} "
+                f"{seq_time / batch_time:7.2f}x {word_similarity(seq_text, batch_text):10.1%}")
+        if stt.has_preview_tier:
+            # Word agreement of the preview tier with the final tier
+            preview_time, preview_text = timed(lambda a: stt.transcribe(a, batched=False, tier="preview"), audio, args.repeat)
+            total_preview += preview_time
+            line += f" {preview_time / duration:12.3f} {word_similarity(seq_text, preview_text):11.1%}"
+        print(line)
+
+    if total_audio:
+        print()
+        print(f"[Bench] {total_audio:.1f}s of audio: sequential RTF {total_seq / total_audio:.3f}, "
+              f"batched RTF {total_batch / total_audio:.3f}, speedup {total_seq / total_batch:.2f}x")
+        if stt.has_preview_tier:
+            print(f"[Bench] Preview tier RTF {total_preview / total_audio:.3f} "
+                  f"({total_seq / total_preview:.2f}x faster than the final tier)")
@@ -0,0 +1,94 @@
+"""VAD benchmark: precision/recall and per-frame cost on labelled WAV fixtures.
+
+Each fixture is a WAV/FLAC file with an Audacity label file next to it
+(same name, .txt) marking the speech regions:
+
+    python bench_vad.py path/to/fixtures --backend energy silero
+"""
+import argparse
+import glob
+import os
+import time
+import numpy as np
+
+from audio_io import load_audio, load_labels
+from vad import create_vad
+
+def truth_for_frames(segments, n_frames, frame_size, sample_rate):
+    centers = (np.arange(n_frames) + 0.5) * frame_size / sample_rate
+    truth = np.zeros(n_frames, dtype=bool)
+    for start, end in segments:
+        truth |= (centers >= start) & (centers < end)
+    return truth
+
+def score(pred, truth):
+    tp = int(np.sum(pred & truth))
+    fp = int(np.sum(pred & ~truth))
+    fn = int(np.sum(~pred & truth))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+def run_backend(backend, fixtures, sample_rate, block_size, gain):
+    vad = create_vad(backend, sample_rate=sample_rate)
+    name = type(vad).__name__
+    all_flags, all_states, all_truth = [], [], []
+    elapsed = 0.0
+    n_frames = 0
+
+    for audio_path, label_path in fixtures:
+        audio = load_audio(audio_path, sample_rate) * gain
+        vad.reset()
+        flags, states = [], []
+        for i in range(0, len(audio), block_size):
+            block = audio[i:i + block_size]
+            t0 = time.perf_counter()
+            vad.process(block)
+            elapsed += time.perf_counter() - t0
+            flags.append(vad.frame_flags)
+            states.append(vad.frame_states)
+
+        flags = np.concatenate(flags) if flags else np.zeros(0, dtype=bool)
+        states = np.concatenate(states) if states else np.zeros(0, dtype=bool)
+        truth = truth_for_frames(load_labels(label_path), len(flags), vad.frame_size, sample_rate)
+        all_flags.append(flags)
+        all_states.append(states)
+        all_truth.append(truth)
+        n_frames += len(flags)
+
+    truth = np.concatenate(all_truth)
+    raw = score(np.concatenate(all_flags), truth)
+    gated = score(np.concatenate(all_states), truth)
+    us_per_frame = 1e6 * elapsed / n_frames if n_frames else 0.0
+    return name, n_frames, raw, gated, us_per_frame
+
+def find_fixtures(folder):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        if not path.lower().endswith((".wav", ".flac")):
+            continue
+        label_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(label_path):
+            fixtures.append((path, label_path))
+        else:
+            print(f"[Bench] Skipping {path}: no label file")
+    return fixtures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark VAD backends on labelled audio.")
+    parser.add_argument("fixtures", help="Folder with .wav/.flac files and matching .txt labels")
+    parser.add_argument("--backend", nargs="+", default=["energy", "silero"])
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--block-size", type=int, default=4096, help="Samples per block (AudioCapture default)")
+    parser.add_argument("--gain", type=float, default=5.0, help="Digital gain applied by AudioWorker")
+    args = parser.parse_args()
+
+    fixtures = find_fixtures(args.fixtures)
+    if not fixtures:
+        raise SystemExit(f"No labelled fixtures found in {args.fixtures}")
+
+    print(f"{'backend':<12} {'frames':>8} {'raw P':>7} {'raw R':>7} {'P':>7} {'R':>7} {'F1':>7} {'us/frame':>9}")
+    for backend in args.backend:
+        name, n_frames, raw, gated, cost = run_backend(backend, fixtures, args.sample_rate, args.block_size, args.gain)
+        print(f"{name:<12} {n_frames:>8} {raw[0]:>7.3f} {raw[1]:>7.3f} {gated[0]:>7.3f} {gated[1]:>7.3f} {gated[2]:>7.3f} {cost:>9.1f}")
@@ -0,0 +1,108 @@
+"""Warm-up benchmark: is the first question as fast as the later ones?
+
+Every configuration runs in a fresh process (cold caches, as after launch),
+loads the model, optionally warms it up, then asks a few questions. It
+reports the first question against the median of the others:
+
+    python bench_warmup.py --model local_models/qwen2.5-coder-3b-instruct-q4_k_m.gguf --audio sample.wav
+
+Drop the OS page cache between runs for a true cold start (the GGUF file
+stays cached otherwise, which hides the mmap cost).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+QUESTIONS = [
+    "Write a function that checks if a string is a palindrome.",
+    "How do you merge two sorted lists?",
+    "Find the second largest number in an array.",
+    "Count the vowels in a string.",
+    "Implement binary search.",
+]
+
+CONFIGS = [
+    ("cold", {"warmup": False}),
+    ("warm-up", {"warmup": True}),
+    ("warm-up + mlock", {"warmup": True, "use_mlock": True}),
+    ("warm-up, no mmap", {"warmup": True, "use_mmap": False}),
+]
+
+def run_child(args):
+    # One configuration, in this (fresh) process; prints a JSON result line
+    result = {"llm_ttft": [], "llm_total": [], "stt": []}
+    t0 = time.perf_counter()
+    from llm import LLM
+    llm = LLM(args.model, max_new_tokens=args.max_tokens, answer_cache=False,
+              use_mmap=not args.no_mmap, use_mlock=args.mlock)
+    result["llm_load"] = time.perf_counter() - t0
+    result["llm_warmup"] = llm.warmup() if args.warmup else 0.0
+    for question in QUESTIONS:
+        llm.history.clear() # Same prompt shape for every question
+        llm.generate_response(question)
+        result["llm_ttft"].append(llm.last_stats.ttft)
+        result["llm_total"].append(llm.last_stats.total_time)
+
+    if args.audio:
+        from audio_io import load_audio
+        from stt import SpeechToText
+        stt = SpeechToText(model_size=args.stt_model)
+        audio = load_audio(args.audio, stt.SAMPLE_RATE)[:stt.SAMPLE_RATE * 10]
+        result["stt_warmup"] = stt.warmup() if args.warmup else 0.0
+        for _ in range(len(QUESTIONS)):
+            t0 = time.perf_counter()
+            stt.transcribe_words(audio)
+            result["stt"].append(time.perf_counter() - t0)
+
+    print("RESULT " + json.dumps(result))
+
+def first_vs_rest(values):
+    if not values:
+        return "-"
+    rest = float(np.median(values[1:])) if len(values) > 1 else values[0]
+    return f"first {values[0] * 1000:7.0f} ms, later {rest * 1000:7.0f} ms ({values[0] / rest:4.2f}x)"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare first-query latency with and without warm-up.")
+    parser.add_argument("--model", default=os.path.join("local_models", "qwen2.5-coder-3b-instruct-q4_k_m.gguf"))
+    parser.add_argument("--audio", default=None, help="WAV/FLAC file to also measure Whisper (first 10 s used)")
+    parser.add_argument("--stt-model", default="small")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mlock", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-mmap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        sys.exit(0)
+
+    for name, config in CONFIGS:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", "--model", args.model,
+               "--stt-model", args.stt_model, "--max-tokens", str(args.max_tokens)]
+        if args.audio:
+            cmd += ["--audio", args.audio]
+        if config.get("warmup"):
+            cmd.append("--warmup")
+        if config.get("use_mlock"):
+            cmd.append("--mlock")
+        if config.get("use_mmap") is False:
+            cmd.append("--no-mmap")
+
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [l for l in out.stdout.splitlines() if l.startswith("RESULT ")]
+        if out.returncode != 0 or not lines:
+            print(f"[Bench] {name}: failed\n{out.stderr[-2000:]}")
+            continue
+        r = json.loads(lines[-1][len("RESULT "):])
+        print(f"[Bench] {name:<18} load {r['llm_load']:5.2f}s, warm-up {r['llm_warmup']:5.2f}s")
+        print(f"        LLM TTFT    {first_vs_rest(r['llm_ttft'])}")
+        print(f"        LLM total   {first_vs_rest(r['llm_total'])}")
+        if r["stt"]:
+            print(f"        Whisper     {first_vs_rest(r['stt'])} (warm-up {r['stt_warmup']:.2f}s)")
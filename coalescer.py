@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+import collections
+from difflib import SequenceMatcher
+
+FILLER_WORDS = {"um", "uh", "erm", "hmm", "like", "so", "okay", "ok"}
+# First words of something that stands on its own as a question or request
+QUESTION_STARTERS = {
+    "what", "why", "how", "when", "where", "which", "who", "whom", "whose",
+    "is", "are", "was", "were", "do", "does", "did", "can", "could", "should", "would",
+    "will", "shall", "may", "might", "must", "have", "has", "had",
+    "explain", "write", "tell", "show", "give", "implement", "describe", "define", "compare",
+}
+
+def normalize_question(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    words = [w for w in text.split() if w not in FILLER_WORDS]
+    return " ".join(words)
+
+def _contains(words, part):
+    # part occurs in words as a run of whole words
+    n = len(part)
+    return any(words[i:i + n] == part for i in range(len(words) - n + 1))
+
+
+class QuestionCoalescer:
+    """Sits in front of LLMWorker.queue and decides what is worth a generation.
+
+    - Near-duplicates of a recent question are dropped: the same normalized
+      text, or, for questions of at least `min_words` words, a run of whole
+      words out of it or a fuzzy match.
+    - A fragment ("in Python?") arriving within `window` seconds of a
+      previous question that had no "?" is merged into it. Anything that
+      reads as a question of its own is forwarded as it is.
+    - The worker reports backlog items it skipped, and whether the newer item
+      was a merge of the skipped one (see Thinker._take_newest). Only those
+      count as merged or superseded: a merge saves nothing if both get answered.
+    """
+
+    def __init__(self, window=1.5, horizon=30.0, similarity=0.9, recent_size=8, min_words=3):
+        self.window = window         # Seconds within which fragments are merged
+        self.horizon = horizon       # Seconds a question counts for de-duplication
+        self.similarity = similarity # SequenceMatcher ratio treated as "same question"
+        self.min_words = min_words   # Shorter questions only match exactly ("thread?" is a follow-up)
+        self.recent = collections.deque(maxlen=recent_size) # [(time, norm, text)]
+        self.lock = threading.Lock()
+        self.received = 0
+        self.forwarded = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.superseded = 0
+
+    def _is_duplicate(self, norm, prev_norm):
+        if norm == prev_norm:
+            return True
+        words, prev_words = norm.split(), prev_norm.split()
+        if len(words) < self.min_words or len(prev_words) < self.min_words:
+            return False
+        if _contains(prev_words, words):
+            return True # Part of the last question transcribed again
+        return SequenceMatcher(None, norm, prev_norm).ratio() >= self.similarity
+
+    def _is_fragment(self, norm, prev_text):
+        # Continues the previous question instead of asking a new one
+        if prev_text.rstrip().endswith("?"):
+            return False
+        return norm.split()[0] not in QUESTION_STARTERS
+
+    def admit(self, text, force=False):
+        """Returns (text to enqueue, merged), or None to drop it.
+
+        merged is True if text is the previous question with this fragment
+        appended. force=True (typed corrections) skips de-duplication and merging.
+        """
+        now = time.monotonic()
+        norm = normalize_question(text)
+        with self.lock:
+            self.received += 1
+            if not norm:
+                self.duplicates += 1
+                return None
+
+            while self.recent and now - self.recent[0][0] > self.horizon:
+                self.recent.popleft()
+
+            if not force:
+                for _, prev_norm, _ in self.recent:
+                    if self._is_duplicate(norm, prev_norm):
+                        self.duplicates += 1
+                        print(f"[Coalescer] Dropped duplicate: {text}")
+                        return None
+
+            merged = False
+            if not force and self.recent and now - self.recent[-1][0] <= self.window:
+                _, last_norm, last_text = self.recent[-1]
+                if self._is_fragment(norm, last_text):
+                    self.recent.pop()
+                    last_words = last_norm.split()
+                    if norm.split()[:len(last_words)] != last_words: # Else it already repeats the last one
+                        text = f"{last_text} {text}"
+                    print(f"[Coalescer] Merged fragments: {text}")
+                    norm, merged = normalize_question(text), True
+
+            self.recent.append((now, norm, text))
+            self.forwarded += 1
+            return text, merged
+
+    def count_skipped(self, merged=False):
+        """A queued question was skipped for a newer one; merged: the newer one includes it."""
+        with self.lock:
+            if merged:
+                self.merged += 1
+            else:
+                self.superseded += 1
+
+    @property
+    def generations_saved(self):
+        return self.duplicates + self.merged + self.superseded
+
+    def print_summary(self):
+        print(f"[Coalescer] {self.received} questions received, {self.forwarded} forwarded, "
+              f"{self.generations_saved} generations saved "
+              f"(duplicates {self.duplicates}, merged {self.merged}, superseded {self.superseded})")
@@ -0,0 +1,59 @@
+import queue
+import sqlite3
+import threading
+
+class BatchedWriter:
+    """Background SQLite writer: put() queues an item, a thread commits the batch.
+
+    The thread sleeps until something is queued, then takes everything that
+    has piled up and hands it to write(db, items) inside one transaction on
+    its own connection, so callers never wait on disk. flush() waits until
+    everything queued so far is committed; close() writes what is still
+    queued first.
+    """
+
+    def __init__(self, path, write, name, tag):
+        self.path = path
+        self.write = write # (connection, [items]) -> None, runs in a transaction
+        self.tag = tag     # Log prefix, e.g. "Cache"
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, name=name, daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def flush(self, timeout=10):
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        db = sqlite3.connect(self.path)
+        try:
+            while True:
+                items = [self.queue.get()] # Sleeps until there is something to write
+                while True:
+                    try:
+                        items.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in items
+                flushes = [item for item in items if isinstance(item, threading.Event)]
+                items = [item for item in items if item is not None and not isinstance(item, threading.Event)]
+                if items:
+                    try:
+                        with db:
+                            self.write(db, items)
+                    except sqlite3.Error as e:
+                        print(f"[{self.tag}] Could not write {len(items)} queued updates: {e}")
+                for done in flushes:
+                    done.set()
+                if stop:
+                    return
+        finally:
+            db.close()
+
+    def close(self, timeout=10):
+        self.queue.put(None)
+        self.thread.join(timeout=timeout)
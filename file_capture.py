@@ -0,0 +1,92 @@
+import numpy as np
+import threading
+import queue
+import time
+import os
+
+from audio_io import load_audio
+
+class FileAudioCapture:
+    """Drop-in replacement for AudioCapture that replays WAV/FLAC files.
+
+    Same start/get_audio_chunk/stop contract (get_audio_chunk waits for a
+    block and returns None once stopped), so AudioWorker can run on a
+    headless box. It also returns None after the last file, so the Listener
+    can transcribe what is still open and return. Blocks are delivered at real time (like a live device,
+    each block after its duration has elapsed) or as fast as possible.
+    """
+
+    def __init__(self, path, sample_rate=16000, block_size=4096, realtime=True, gap_seconds=2.0):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.realtime = realtime
+        self.gap_seconds = gap_seconds # Silence after each file so the VAD can close the utterance
+        self.audio_queue = queue.Queue()
+        self.running = False
+        self.thread = None
+        self.block_time = None # perf_counter() when the last block from get_audio_chunk() was "recorded"
+        self.finished = threading.Event()
+        self.files = self._find_files(path)
+
+    def _find_files(self, path):
+        if os.path.isdir(path):
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                     if f.lower().endswith((".wav", ".flac"))]
+        else:
+            files = [path]
+        if not files:
+            print(f"[Audio] No WAV/FLAC files found in {path}")
+        return files
+
+    def start(self):
+        self.running = True
+        self.finished.clear()
+        self.thread = threading.Thread(target=self._play_loop, daemon=True)
+        self.thread.start()
+
+    def _blocks(self, audio):
+        for i in range(0, len(audio), self.block_size):
+            block = audio[i:i + self.block_size]
+            if len(block) < self.block_size:
+                # Pad the last block so every chunk has the live-device shape
+                block = np.concatenate([block, np.zeros(self.block_size - len(block), dtype=np.float32)])
+            yield block
+
+    def _play_loop(self):
+        block_duration = self.block_size / self.sample_rate
+        next_time = time.perf_counter()
+        silence = np.zeros(int(self.gap_seconds * self.sample_rate), dtype=np.float32)
+        try:
+            for path in self.files:
+                print(f"[Audio] Replaying: {path}")
+                audio = load_audio(path, self.sample_rate)
+                for data in (audio, silence):
+                    for block in self._blocks(data):
+                        if not self.running:
+                            return
+                        if self.realtime:
+                            # A live recorder hands out a block once it has been recorded
+                            next_time += block_duration
+                            delay = next_time - time.perf_counter()
+                            if delay > 0:
+                                time.sleep(delay)
+                        self.audio_queue.put((time.perf_counter(), block.copy()))
+        except Exception as e:
+            print(f"[Audio] Replay Error: {e}")
+        finally:
+            self.running = False
+            self.audio_queue.put(None) # End of stream, after the last block
+            self.finished.set()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.audio_queue.put(None) # Wakes a waiting get_audio_chunk()
+
+    def get_audio_chunk(self):
+        item = self.audio_queue.get()
+        if item is None:
+            return None
+        self.block_time, block = item
+        return block
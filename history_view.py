@@ -0,0 +1,248 @@
+"""Virtualized chat history: a model/view list instead of one ever-growing QTextEdit.
+
+HistoryModel keeps every message as raw text, which is cheap and stays
+searchable. MessageDelegate turns a message into a QTextDocument only when
+its row is painted, and keeps at most `max_rendered` of them; the least
+recently used ones are dropped and rebuilt if they scroll back into view.
+Rows that were never painted get a height estimated from their length.
+Real heights are remembered per row and width bucket, so a resize back to an
+earlier width costs nothing.
+"""
+import math
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRectF, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QKeySequence, QColor, QFontMetrics
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QApplication, QAbstractItemView, QStyle
+
+ROLE_ROLE = Qt.ItemDataRole.UserRole + 1      # "User", "AI", ...
+STREAMING_ROLE = Qt.ItemDataRole.UserRole + 2 # Still receiving tokens
+
+class HistoryModel(QAbstractListModel):
+    """Messages as [role, raw text, streaming]: the current session, or search results."""
+    text_appended = pyqtSignal(int, str) # row, text added to the end of a streaming message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.messages = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        msg = self.messages[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return msg[1]
+        if role == ROLE_ROLE:
+            return msg[0]
+        if role == STREAMING_ROLE:
+            return msg[2]
+        return None
+
+    def append(self, role, text, streaming=False):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append([role, text, streaming])
+        self.endInsertRows()
+        return row
+
+    def set_text(self, row, text, streaming=None):
+        msg = self.messages[row]
+        msg[1] = text
+        if streaming is not None:
+            msg[2] = streaming
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def append_text(self, row, text):
+        """Extends a streaming message; views get text_appended instead of dataChanged."""
+        self.messages[row][1] += text
+        self.text_appended.emit(row, text)
+
+    def clear(self):
+        self.set_messages([])
+
+    def set_messages(self, messages):
+        self.beginResetModel()
+        self.messages = [list(m) for m in messages]
+        self.endResetModel()
+
+    def find(self, query, start=0):
+        """Row of the next message containing `query` (case-insensitive), wrapping around; -1 if none."""
+        query = query.lower()
+        n = len(self.messages)
+        for i in range(n):
+            row = (start + i) % n
+            if query in self.messages[row][1].lower():
+                return row
+        return -1
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Renders message bubbles lazily, with an LRU cap on rendered documents."""
+    WIDTH_STEP = 32    # Documents are laid out at the viewport width rounded down to this
+    BUBBLE_EXTRA = 41  # Role line aside, what the bubble HTML adds to the text height
+    STREAM_STEP = 120  # A streaming row grows in steps this tall, so the list is relaid out every few lines
+
+    def __init__(self, view, to_html, max_rendered=64):
+        super().__init__(view)
+        self.view = view
+        self.to_html = to_html # (role, text, streaming) -> HTML
+        self.max_rendered = max_rendered
+        self.docs = OrderedDict() # row -> QTextDocument, least recently used first
+        self.heights = {}         # row -> {width bucket: height}, measured when painted
+        self.estimates = {}       # row -> (width bucket, height) for rows not painted at that width
+
+    def _width(self):
+        width = self.view.viewport().width()
+        return max(self.WIDTH_STEP, width - width % self.WIDTH_STEP)
+
+    def _estimate(self, index, width):
+        # Wrapped line count at the average character width; replaced once the row is painted
+        cached = self.estimates.get(index.row())
+        if cached is not None and cached[0] == width:
+            return cached[1]
+        fm = QFontMetrics(self.view.font())
+        per_line = max(1, width // max(1, fm.averageCharWidth()))
+        lines = sum(math.ceil(len(line) / per_line) or 1 for line in (index.data() or "").split("\n"))
+        height = (lines + 1) * fm.lineSpacing() + self.BUBBLE_EXTRA
+        self.estimates[index.row()] = (width, height)
+        return height
+
+    def _document(self, index, width):
+        row = index.row()
+        doc = self.docs.get(row)
+        if doc is None:
+            doc = QTextDocument()
+            doc.setDefaultFont(self.view.font())
+            doc.setHtml(self.to_html(index.data(ROLE_ROLE), index.data(), index.data(STREAMING_ROLE)))
+            self.docs[row] = doc
+            while len(self.docs) > self.max_rendered:
+                self.docs.popitem(last=False)
+        else:
+            self.docs.move_to_end(row)
+        if doc.textWidth() != width:
+            doc.setTextWidth(width) # Reflow only; the HTML is not parsed again
+        self._measure(index, row, doc, width)
+        return doc
+
+    def _measure(self, index, row, doc, width):
+        height = math.ceil(doc.size().height())
+        if index.data(STREAMING_ROLE):
+            height = -(-height // self.STREAM_STEP) * self.STREAM_STEP
+        sizes = self.heights.setdefault(row, {})
+        if sizes.get(width) != height:
+            sizes[width] = height
+            self.sizeHintChanged.emit(index) # Estimate or stale height corrected; relaid out later
+        return height
+
+    def sizeHint(self, option, index):
+        width = self._width()
+        height = self.heights.get(index.row(), {}).get(width)
+        if height is None:
+            height = self._estimate(index, width)
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        doc = self._document(index, self._width())
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, QColor(255, 255, 255, 15))
+        painter.translate(option.rect.topLeft().toPointF())
+        doc.drawContents(painter, QRectF(0, 0, option.rect.width(), option.rect.height()))
+        painter.restore()
+
+    def append_text(self, index, text):
+        """Adds streamed text to the end of a rendered row instead of rebuilding it from HTML.
+
+        Streaming rows are escaped plain text, so inserting at the end of the
+        bubble gives the same document setHtml would. Returns True if only the
+        row needs a repaint, False if its height changed (relaid out later).
+        """
+        row = index.row()
+        doc = self.docs.get(row)
+        sizes = self.heights.get(row, {})
+        self.estimates.pop(row, None)
+        if doc is None:
+            # Off screen: fall back to the estimate, painted from scratch if it comes into view
+            if self.heights.pop(row, None) is not None:
+                self.sizeHintChanged.emit(index)
+            return False
+        cursor = doc.rootFrame().lastCursorPosition()
+        cursor.insertText(text.replace("\n", "\u2028")) # Line breaks like <br>, not new bubbles
+        width = doc.textWidth()
+        old = sizes.get(width)
+        self.heights[row] = {width: old}
+        return self._measure(index, row, doc, width) == old
+
+    def invalidate(self, row):
+        self.docs.pop(row, None)
+        self.heights.pop(row, None)
+        self.estimates.pop(row, None)
+
+    def reset(self):
+        self.docs.clear()
+        self.heights.clear()
+        self.estimates.clear()
+
+
+class HistoryView(QListView):
+    """Lays out and paints only the visible messages.
+
+    With follow=True the view sticks to the newest (bottom) message unless
+    the user scrolls up.
+    """
+
+    def __init__(self, model, to_html, max_rendered=64, follow=True, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.delegate = MessageDelegate(self, to_html, max_rendered)
+        self.setItemDelegate(self.delegate)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        # Size hints are cached or estimated, never rendered, so one pass over a long
+        # history is cheap; batches would restart (and jump the scroll bar) on every
+        # corrected height
+        self.setLayoutMode(QListView.LayoutMode.SinglePass)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+
+        self.follow = follow
+        sb = self.verticalScrollBar()
+        if follow:
+            sb.valueChanged.connect(lambda value: setattr(self, "follow", value >= sb.maximum() - 4))
+        sb.rangeChanged.connect(lambda lo, hi: self.follow and sb.setValue(hi))
+        model.dataChanged.connect(self._on_data_changed)
+        model.text_appended.connect(self._on_text_appended)
+        model.modelReset.connect(self.delegate.reset)
+
+    def _on_data_changed(self, first, last):
+        for row in range(first.row(), last.row() + 1):
+            self.delegate.invalidate(row)
+            self.delegate.sizeHintChanged.emit(self.model().index(row))
+
+    def _on_text_appended(self, row, text):
+        index = self.model().index(row)
+        if self.delegate.append_text(index, text):
+            self.viewport().update(self.visualRect(index)) # Same height: repaint just this row
+
+    def find_next(self, query):
+        """Selects and scrolls to the next message containing `query`; False if there is none."""
+        if not query:
+            return False
+        current = self.currentIndex()
+        row = self.model().find(query, start=current.row() + 1 if current.isValid() else 0)
+        if row < 0:
+            return False
+        index = self.model().index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+        return True
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy) and self.currentIndex().isValid():
+            QApplication.clipboard().setText(self.currentIndex().data())
+            return
+        super().keyPressEvent(event)
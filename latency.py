@@ -0,0 +1,242 @@
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import collections
+import numpy as np
+
+# Force Absolute Path for finding local resources
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+
+# Stage timestamps recorded per utterance, in pipeline order
+STAGES = [
+    "capture",        # Recording time of the block that opened the utterance
+    "speech_end",     # Last block that still had voice in it
+    "vad_end",        # End of speech declared (VAD hangover elapsed, or a "?" in the preview)
+    "stt_final",      # Final transcript ready
+    "llm_enqueue",    # Put in LLMWorker.queue
+    "llm_start",      # Taken off the queue
+    "first_token",
+    "last_token",
+    "ui_first_token", # First token rendered by TransparentOverlay
+    "ui_done",        # Final formatted message rendered
+]
+
+# Derived intervals summarized as p50/p95/p99
+INTERVALS = [
+    ("hangover", "speech_end", "vad_end"),
+    ("stt_final", "vad_end", "stt_final"),
+    ("queue_wait", "llm_enqueue", "llm_start"),
+    ("time_to_first_token", "llm_start", "first_token"),
+    ("generation", "first_token", "last_token"),
+    ("ui_first_token", "first_token", "ui_first_token"),
+    ("speech_end_to_first_token", "speech_end", "first_token"),
+    ("speech_end_to_ui", "speech_end", "ui_first_token"),
+]
+
+class LatencyTracer:
+    """Per-utterance stage timestamps, written to a rotating JSONL file.
+
+    Every utterance gets an integer ID; each pipeline stage calls mark() with
+    that ID from whatever thread it runs on. finish() writes one JSON line
+    and feeds the rolling p50/p95/p99 summary.
+    """
+
+    def __init__(self, path=None, max_bytes=5 * 1024 * 1024, backup_count=5,
+                 window=1000, summary_every=20, enabled=True):
+        self.path = path or os.path.join(LOG_DIR, "latency.jsonl")
+        self.summary_path = os.path.splitext(self.path)[0] + "_summary.json"
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.summary_every = summary_every
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.active = {}
+        self.samples = {name: collections.deque(maxlen=window) for name, _, _ in INTERVALS}
+        self.finished = 0
+        self._logger = None
+
+    def _get_logger(self):
+        # Created on first write so importing this module never touches disk
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            logger = logging.getLogger(f"latency.{id(self)}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def new_utterance(self, uid=None):
+        # uid: adopt an ID allocated elsewhere (a worker process, see multiproc.py)
+        with self.lock:
+            if uid is None:
+                uid = self.next_id
+                self.next_id += 1
+            if self.enabled:
+                self.active[uid] = {"id": uid, "wall_time": time.time(), "marks": {}, "fields": {}}
+        return uid
+
+    def mark(self, uid, stage, t=None):
+        """Record when a stage happened. Only the first mark per stage counts."""
+        if not self.enabled or uid is None:
+            return
+        if t is None:
+            t = time.perf_counter()
+        with self.lock:
+            rec = self.active.get(uid)
+            if rec is not None and stage not in rec["marks"]:
+                rec["marks"][stage] = t
+
+    def add(self, uid, key, value):
+        # Repeated measurements (e.g. every preview decode) are kept as a list
+        if not self.enabled or uid is None:
+            return
+        with self.lock:
+            rec = self.active.get(uid)
+            if rec is not None:
+                rec["fields"].setdefault(key, []).append(value)
+
+    def set(self, uid, key, value):
+        if not self.enabled or uid is None:
+            return
+        with self.lock:
+            rec = self.active.get(uid)
+            if rec is not None:
+                rec["fields"][key] = value
+
+    def finish(self, uid, **fields):
+        if not self.enabled or uid is None:
+            return
+        with self.lock:
+            rec = self.active.pop(uid, None)
+            if rec is None:
+                return
+            rec["fields"].update(fields)
+            marks = rec["marks"]
+
+            entry = {"id": uid, "time": rec["wall_time"]}
+            t0 = min(marks.values()) if marks else None
+            entry["stages_ms"] = {s: round((marks[s] - t0) * 1000.0, 2) for s in STAGES if s in marks}
+            intervals = {}
+            for name, a, b in INTERVALS:
+                if a in marks and b in marks:
+                    intervals[name] = round((marks[b] - marks[a]) * 1000.0, 2)
+                    self.samples[name].append(intervals[name])
+            entry["intervals_ms"] = intervals
+            entry.update(rec["fields"])
+
+            self.finished += 1
+            write_summary = self.finished % self.summary_every == 0
+
+        try:
+            self._get_logger().info(json.dumps(entry))
+            if write_summary:
+                self.write_summary()
+        except Exception as e:
+            print(f"[Latency] Could not write trace: {e}")
+        return entry
+
+    def summary(self):
+        with self.lock:
+            result = {}
+            for name, values in self.samples.items():
+                if not values:
+                    continue
+                p50, p95, p99 = np.percentile(list(values), [50, 95, 99])
+                result[name] = {"n": len(values), "p50": round(float(p50), 2),
+                                "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+            return result
+
+    def write_summary(self):
+        summary = self.summary()
+        os.makedirs(os.path.dirname(self.summary_path), exist_ok=True)
+        with open(self.summary_path, "w", encoding="utf-8") as f:
+            json.dump({"updated": time.time(), "intervals_ms": summary}, f, indent=2)
+        return summary
+
+    def print_summary(self):
+        for name, s in self.summary().items():
+            print(f"[Latency] {name:<26} n={s['n']:<5} p50={s['p50']:8.1f} ms  p95={s['p95']:8.1f} ms  p99={s['p99']:8.1f} ms")
+
+    def close(self):
+        if not self.enabled or self.finished == 0:
+            return
+        try:
+            self.write_summary()
+        except Exception as e:
+            print(f"[Latency] Could not write summary: {e}")
+        self.print_summary()
+
+
+class StartupTimer:
+    """Startup breakdown: when each loading step ran, measured from process start.
+
+    Steps run on different threads (Whisper and the LLM load concurrently), so
+    each span keeps its own start and end. Once every milestone in `expect` is
+    reached the breakdown is printed and appended to logs/startup.jsonl,
+    unless `tracer` (whose enabled flag benchmarks turn off) says otherwise.
+    """
+
+    def __init__(self, path=None, expect=("listening", "llm_ready"), tracer=None):
+        self.path = path or os.path.join(LOG_DIR, "startup.jsonl")
+        self.tracer = tracer
+        self.expect = set(expect)
+        self.t0 = time.perf_counter()
+        self.lock = threading.Lock()
+        self.spans = {} # name -> (start, end, thread name), seconds since t0
+        self.reported = False
+
+    def _record(self, name, start, end, thread=None):
+        # perf_counter() is system-wide, so worker processes can report their own spans
+        with self.lock:
+            self.spans.setdefault(name, (start - self.t0, end - self.t0, thread or threading.current_thread().name))
+            report = not self.reported and self.expect <= set(self.spans)
+            if report:
+                self.reported = True
+        if report:
+            self.report()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self._record(name, now, now)
+
+    def report(self):
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda kv: kv[1][1])
+        for name, (start, end, thread) in spans:
+            if end > start:
+                print(f"[Startup] {name:<16} {start:6.2f}s -> {end:6.2f}s ({end - start:5.2f}s) [{thread}]")
+            else:
+                print(f"[Startup] {name:<16} {end:6.2f}s")
+        if self.tracer is not None and not self.tracer.enabled:
+            return
+        entry = {"time": time.time(), "spans": {n: [round(a, 3), round(b, 3)] for n, (a, b, _) in spans}}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except Exception as e:
+            print(f"[Startup] Could not write timings: {e}")
+
+
+# Shared tracer used by the workers and the overlay
+tracer = LatencyTracer()
+# Created at first import (main imports this module first)
+startup = StartupTimer(tracer=tracer)
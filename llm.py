@@ -1,22 +1,225 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
 import time
 import os
 import sys
 import threading
+import hashlib
+import pickle
+
+from answer_cache import AnswerCache
+from coalescer import normalize_question
 
 # Force Absolute Path for finding local resources
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_CACHE_DIR = os.path.join(BASE_DIR, "local_models", "prompt_cache")
 
 try:
-    from llama_cpp import Llama
+    from llama_cpp import Llama, LogitsProcessorList
     HAS_LLAMA_CPP = True
+    try:
+        from llama_cpp import llama_supports_gpu_offload
+    except ImportError:
+        llama_supports_gpu_offload = None
+    try:
+        from llama_cpp import LlamaRAMCache
+    except ImportError:
+        LlamaRAMCache = None # Older llama-cpp-python: disk snapshot only
 except ImportError:
     HAS_LLAMA_CPP = False
     print("Warning: llama_cpp not installed. GGUF models will not work.")
 
+class GenerationStats:
+    """Timings and real token counts for one generate_response() call."""
+
+    def __init__(self, model=""):
+        self.model = model
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self.ttft = 0.0             # Call -> first token (s)
+        self.prompt_eval_time = 0.0 # Call -> prompt evaluated, before the first token is sampled (s)
+        self.decode_time = 0.0      # First token -> last token (s)
+        self.total_time = 0.0
+        self.cancelled = False      # Stopped early by should_stop()
+        self.cached = False         # Replayed from the answer cache, nothing generated
+        self.speculative = False    # Replayed from an answer generated on a partial transcript
+
+    @property
+    def decode_tps(self):
+        # The first token comes out of prefill, so it is not counted as decode
+        if self.decode_time <= 0 or self.generated_tokens < 2:
+            return 0.0
+        return (self.generated_tokens - 1) / self.decode_time
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "generated_tokens": self.generated_tokens,
+            "ttft": round(self.ttft, 4),
+            "prompt_eval_time": round(self.prompt_eval_time, 4),
+            "decode_time": round(self.decode_time, 4),
+            "decode_tps": round(self.decode_tps, 2),
+            "total_time": round(self.total_time, 4),
+            "cancelled": self.cancelled,
+            "cached": self.cached,
+            "speculative": self.speculative,
+        }
+
+    def __str__(self):
+        return (f"prompt {self.prompt_tokens} tok in {self.prompt_eval_time:.2f}s, "
+                f"TTFT {self.ttft:.2f}s, {self.generated_tokens} tok @ {self.decode_tps:.2f} t/s, "
+                f"total {self.total_time:.2f}s")
+
+
+class SessionStats:
+    """Aggregates GenerationStats over a session, grouped by model file."""
+
+    def __init__(self):
+        self.runs = []
+
+    def add(self, stats):
+        self.runs.append(stats)
+
+    def summary(self):
+        groups = {}
+        for s in self.runs:
+            groups.setdefault(s.model, []).append(s)
+
+        result = {}
+        for model, runs in groups.items():
+            ttfts = sorted(r.ttft for r in runs)
+            decode_time = sum(r.decode_time for r in runs)
+            decode_tokens = sum(max(0, r.generated_tokens - 1) for r in runs)
+            prompt_time = sum(r.prompt_eval_time for r in runs)
+            prompt_tokens = sum(r.prompt_tokens for r in runs)
+            result[model] = {
+                "responses": len(runs),
+                "prompt_tokens": prompt_tokens,
+                "generated_tokens": sum(r.generated_tokens for r in runs),
+                "ttft_mean": sum(ttfts) / len(ttfts),
+                "ttft_p50": ttfts[len(ttfts) // 2],
+                "ttft_p95": ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))],
+                "prompt_tps": prompt_tokens / prompt_time if prompt_time > 0 else 0.0,
+                "decode_tps": decode_tokens / decode_time if decode_time > 0 else 0.0,
+            }
+        return result
+
+    def print_summary(self):
+        for model, s in self.summary().items():
+            print(f"[LLM] Session {os.path.basename(model)}: {s['responses']} responses, "
+                  f"TTFT mean {s['ttft_mean']:.2f}s (p50 {s['ttft_p50']:.2f}s, p95 {s['ttft_p95']:.2f}s), "
+                  f"prefill {s['prompt_tps']:.1f} t/s, decode {s['decode_tps']:.2f} t/s, "
+                  f"{s['generated_tokens']} tokens generated")
+
+
+class ConversationHistory:
+    """System prompt + rolling summary + the most recent turns, within a token budget.
+
+    When the turns outgrow the budget the oldest ones are moved to `evicted`.
+    LLM.maybe_summarize() folds them into the summary later, while the model
+    is idle, so the prompt size (and prefill cost) stays flat over a session.
+    """
+    MESSAGE_OVERHEAD = 6   # Chat template tokens around each message
+    MAX_PENDING = 12       # Evicted turns kept before falling back to a crude summary
+
+    def __init__(self, system_prompt, count_tokens, budget=1000, summary_budget=200):
+        self.system_prompt = system_prompt
+        self.count_tokens = count_tokens
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.system_tokens = count_tokens(system_prompt) + self.MESSAGE_OVERHEAD
+        self.clear()
+
+    def clear(self):
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns = []        # [{"role", "content"}]
+        self.turn_tokens = []
+        self.evicted = []      # Dropped from the prompt, not yet in the summary
+
+    def total_tokens(self):
+        return self.system_tokens + self.summary_tokens + sum(self.turn_tokens)
+
+    def add(self, role, content):
+        self.turns.append({"role": role, "content": content})
+        self.turn_tokens.append(self.count_tokens(content) + self.MESSAGE_OVERHEAD)
+        self._enforce_budget()
+
+    def drop_last(self):
+        """Removes the newest turn (a question whose answer was cancelled)."""
+        if self.turns:
+            self.turns.pop()
+            self.turn_tokens.pop()
+
+    def _enforce_budget(self):
+        # Always keep the latest question and its answer, even if they alone are over budget
+        keep = 1
+        for i in range(len(self.turns) - 1, -1, -1):
+            if self.turns[i]["role"] == "user":
+                keep = len(self.turns) - i
+                break
+        while len(self.turns) > keep and self.total_tokens() > self.budget:
+            self.evicted.append(self.turns.pop(0))
+            self.turn_tokens.pop(0)
+
+        if len(self.evicted) > self.MAX_PENDING:
+            # Never idle long enough to summarize: keep just the questions
+            old = self.evicted[:-self.MAX_PENDING]
+            self.evicted = self.evicted[-self.MAX_PENDING:]
+            asked = "; ".join(t["content"][:80] for t in old if t["role"] == "user")
+            if asked:
+                self.set_summary((self.summary + " Earlier questions: " + asked).strip())
+
+    def set_summary(self, summary):
+        # Trim by words until it fits its own budget
+        words = summary.split()
+        while words and self.count_tokens(" ".join(words)) > self.summary_budget:
+            words = words[len(words) // 4 + 1:]
+        self.summary = " ".join(words)
+        self.summary_tokens = (self.count_tokens(self.summary) + self.MESSAGE_OVERHEAD) if self.summary else 0
+        self._enforce_budget()
+
+    def messages(self):
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.summary:
+            # Separate message so the system prompt prefix stays identical
+            messages.append({"role": "system", "content": "Summary of the earlier conversation: " + self.summary})
+        return messages + list(self.turns)
+
+
+class _PrefillProbe:
+    """Logits processor that changes nothing; it notes when prefill ended.
+
+    Its first call comes right after the prompt has been evaluated and before
+    the first token is sampled, with input_ids holding exactly the prompt.
+    """
+
+    def __init__(self):
+        self.time = None
+        self.prompt_tokens = 0
+
+    def __call__(self, input_ids, scores):
+        if self.time is None:
+            self.time = time.perf_counter()
+            self.prompt_tokens = int(input_ids.shape[-1]) # numpy (llama_cpp) or torch (batch, seq)
+        return scores
+
+
+def _stopping_criteria(should_stop):
+    # Lets transformers' generate() poll a plain Python flag. Built on demand:
+    # torch/transformers are only imported on the transformers path.
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _StopWhen(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), bool(should_stop()), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([_StopWhen()])
+
+
 class LLM:
-    def __init__(self, model_path=r"local_models\qwen2.5-coder-3b-instruct-q4_k_m.gguf"):
+    def __init__(self, model_path=r"local_models\qwen2.5-coder-3b-instruct-q4_k_m.gguf", n_ctx=2048, max_new_tokens=1024, history_budget=None,
+                 state_cache_bytes=1 << 30, answer_cache=True, use_mmap=True, use_mlock=False):
         # Resolve absolute path
         if not os.path.isabs(model_path):
             self.model_path = os.path.join(BASE_DIR, model_path)
@@ -34,19 +237,39 @@ class LLM:
             else:
                 print(f"Folder {folder} does not exist.")
         
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Everything but the model path, so reload_model() keeps the same settings
+        self.options = dict(n_ctx=n_ctx, max_new_tokens=max_new_tokens, history_budget=history_budget,
+                            state_cache_bytes=state_cache_bytes, answer_cache=answer_cache,
+                            use_mmap=use_mmap, use_mlock=use_mlock)
+        self.device = "cpu"
         self.model_type = "transformers"
+        # Kept across reload_model() so models can be compared in one session
+        self.session_stats = getattr(self, "session_stats", None) or SessionStats()
+        self.last_stats = None
+        self.n_ctx = n_ctx
+        self.max_new_tokens = max_new_tokens
+        # GGUF weights: mmap pages them in lazily (fast load, cold first query unless
+        # warmed up); mlock pins them in RAM so they are never paged out again
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        # Repeated questions are answered from disk instead of regenerated
+        self.answer_cache = AnswerCache() if answer_cache else None
+        self.speculation = None # (normalized question, prompt messages, answer) from speculate()
         
         # Check if it's a GGUF model
         if self.model_path.lower().endswith(".gguf"):
             if HAS_LLAMA_CPP:
                 print("Detected GGUF model. Using llama_cpp for high performance.")
                 self.model_type = "llama_cpp"
+                if llama_supports_gpu_offload is not None and llama_supports_gpu_offload():
+                    self.device = "gpu"
                 try:
                     self.model = Llama(
                         model_path=self.model_path,
                         n_gpu_layers=-1, # Offload all layers to GPU
-                        n_ctx=2048,      # Context window
+                        n_ctx=self.n_ctx, # Context window
+                        use_mmap=self.use_mmap,
+                        use_mlock=self.use_mlock,
                         verbose=False
                     )
                     print(f"LLM (GGUF) loaded on {self.device}")
@@ -57,7 +280,10 @@ class LLM:
                 print("Error: GGUF model detected but llama_cpp is not installed.")
                 raise ImportError("Please install llama-cpp-python to use GGUF models.")
         else:
-            # Fallback to transformers
+            # Fallback to transformers (heavy imports, only paid on this path)
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
             try:
                 self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, trust_remote_code=True)
                 self.model = AutoModelForCausalLM.from_pretrained(
@@ -71,46 +297,327 @@ class LLM:
                 print(f"Error loading LLM: {e}")
                 raise e
 
-        self.history = [
-            {"role": "system", "content": "You are a code-generator. \nRULES:\n1. NO conversational text. NO 'Certainly', 'Here is the code', 'Below is', NO conclusions.\n2. Start immediately with the code block.\n3. After the code, provide a Time and Space Complexity analysis.\n4. FORMAT:\n```language\n<code>\n```\n### Complexity\nTime: O(...)\nSpace: O(...)"}
+        self.system_prompt = "You are a code-generator. \nRULES:\n1. NO conversational text. NO 'Certainly', 'Here is the code', 'Below is', NO conclusions.\n2. Start immediately with the code block.\n3. After the code, provide a Time and Space Complexity analysis.\n4. FORMAT:\n```language\n<code>\n```\n### Complexity\nTime: O(...)\nSpace: O(...)"
+        # Prompt must leave room for the answer inside the context window
+        if history_budget is None:
+            history_budget = self.n_ctx - self.max_new_tokens - 32
+        self.history = ConversationHistory(self.system_prompt, self.count_tokens, budget=history_budget)
+
+        if self.model_type == "llama_cpp":
+            self._init_prompt_cache(state_cache_bytes)
+
+    # --- Prompt / KV state reuse (llama_cpp only) ---
+    def _init_prompt_cache(self, state_cache_bytes):
+        # llama_cpp already reuses the KV prefix shared with the previous call.
+        # The RAM cache keeps states of earlier calls too, so a summary or other
+        # housekeeping completion does not throw away the conversation prefix.
+        if LlamaRAMCache is not None and state_cache_bytes:
+            self.model.set_cache(LlamaRAMCache(capacity_bytes=state_cache_bytes))
+
+        path = self._prompt_state_path()
+        try:
+            start = time.perf_counter()
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+                self._restore_state(state)
+                print(f"[LLM] Restored system prompt state from disk ({state.n_tokens} tokens) in {time.perf_counter() - start:.2f}s")
+                return
+
+            # Find the token prefix every conversation starts with: render two
+            # prompts that differ only in the user message and keep what they share
+            system = [{"role": "system", "content": self.system_prompt}]
+            self._complete(system + [{"role": "user", "content": "a"}], max_tokens=1)
+            tokens_a = list(self.model.input_ids)
+            self._complete(system + [{"role": "user", "content": "b"}], max_tokens=1)
+            tokens_b = list(self.model.input_ids)
+
+            prefix = 0
+            for x, y in zip(tokens_a, tokens_b):
+                if x != y:
+                    break
+                prefix += 1
+            self.model.n_tokens = prefix # KV beyond this is cleared on the next eval
+            state = self.model.save_state()
+            self._remember_state(state)
+
+            os.makedirs(PROMPT_CACHE_DIR, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f)
+            os.replace(tmp_path, path)
+            print(f"[LLM] Saved system prompt state ({prefix} tokens) in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"[LLM] Prompt state cache unavailable: {e}")
+
+    def _prompt_state_path(self):
+        # Keyed by model file (path, size, mtime), context size and prompt text
+        st = os.stat(self.model_path)
+        key = f"{os.path.abspath(self.model_path)}|{st.st_size}|{int(st.st_mtime)}|{self.n_ctx}|{self.system_prompt}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(self.model_path))[0]
+        return os.path.join(PROMPT_CACHE_DIR, f"{name}-{digest}.state")
+
+    def _remember_state(self, state):
+        if getattr(self.model, "cache", None) is not None:
+            self.model.cache[state.input_ids.tolist()] = state
+
+    def _restore_state(self, state):
+        self.model.load_state(state)
+        self._remember_state(state)
+
+    def save_conversation(self, path):
+        """Persist history (and the evaluated KV state on llama_cpp) for a later resume."""
+        data = {
+            "model_path": self.model_path,
+            "system_prompt": self.system_prompt,
+            "summary": self.history.summary,
+            "turns": list(self.history.turns),
+            "evicted": list(self.history.evicted),
+        }
+        if self.model_type == "llama_cpp":
+            data["state"] = self.model.save_state()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load_conversation(self, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+
+        self.history.clear()
+        if data.get("summary"):
+            self.history.set_summary(data["summary"])
+        for turn in data.get("turns", []):
+            self.history.add(turn["role"], turn["content"])
+        self.history.evicted = data.get("evicted", []) + self.history.evicted
+
+        # The KV state is only valid for the same model and system prompt
+        same_prompt = data.get("model_path") == self.model_path and data.get("system_prompt") == self.system_prompt
+        if self.model_type == "llama_cpp" and "state" in data and same_prompt:
+            self._restore_state(data["state"])
+            print(f"[LLM] Resumed conversation with {data['state'].n_tokens} tokens already evaluated")
+
+    def warmup(self):
+        """Short throwaway generation so the first real question runs at steady-state speed.
+
+        Touches every weight page (mmap), allocates the compute buffers and
+        compiles/loads the GPU kernels. Not recorded in session stats or history.
+        """
+        start = time.perf_counter()
+        messages = [{"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": "Reverse a string in Python."}]
+        try:
+            self._complete(messages, max_tokens=16)
+        except Exception as e:
+            print(f"[LLM] Warm-up failed: {e}")
+            return 0.0
+        elapsed = time.perf_counter() - start
+        print(f"[LLM] Warm-up done in {elapsed:.2f}s")
+        return elapsed
+
+    def count_tokens(self, text):
+        if not text:
+            return 0
+        if self.model_type == "llama_cpp":
+            return len(self.model.tokenize(text.encode("utf-8"), add_bos=False))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _complete(self, messages, max_tokens, temperature=0.2, should_stop=None):
+        # Plain (non-streamed to the UI) completion used for housekeeping tasks.
+        # Returns None if should_stop() fired before the end.
+        text = ""
+        if self.model_type == "llama_cpp":
+            stream = self.model.create_chat_completion(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            for chunk in stream:
+                if should_stop and should_stop():
+                    return None # Leaving the generator stops llama_cpp
+                text += chunk['choices'][0]['delta'].get('content', '')
+        else:
+            prompt = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            model_inputs = self.tokenizer([prompt], return_tensors="pt").to(self.device)
+            stopping = _stopping_criteria(should_stop) if should_stop else None
+            output = self.model.generate(
+                inputs=model_inputs.input_ids,
+                attention_mask=model_inputs.attention_mask,
+                max_new_tokens=max_tokens,
+                do_sample=True,
+                temperature=temperature,
+                pad_token_id=self.tokenizer.eos_token_id,
+                stopping_criteria=stopping
+            )
+            if should_stop and should_stop():
+                return None
+            new_ids = output[0][model_inputs.input_ids.shape[1]:]
+            text = self.tokenizer.decode(new_ids, skip_special_tokens=True)
+        return text.strip()
+
+    def maybe_summarize(self, should_stop=None):
+        """Fold evicted turns into the rolling summary. Call only while idle."""
+        if not self.history.evicted:
+            return False
+
+        turns = list(self.history.evicted)
+        convo = "\n".join(f"{t['role'].capitalize()}: {t['content'][:600]}" for t in turns)
+        messages = [
+            {"role": "system", "content": "You summarize conversations. Keep the questions asked, names, decisions and facts. Plain text, no code, no preamble."},
+            {"role": "user", "content": f"Previous summary:\n{self.history.summary or '(none)'}\n\nNew conversation:\n{convo}\n\nWrite the updated summary in under 120 words."}
         ]
 
-    def generate_response(self, user_text, stream_callback=None):
+        start = time.perf_counter()
+        try:
+            summary = self._complete(messages, max_tokens=self.history.summary_budget, should_stop=should_stop)
+        except Exception as e:
+            print(f"[LLM] Summarization failed: {e}")
+            return False
+        if summary is None:
+            return False # Interrupted by a new question; retry next idle period
+
+        # Only drop what was summarized (more may have been evicted meanwhile)
+        self.history.evicted = self.history.evicted[len(turns):]
+        self.history.set_summary(summary)
+        print(f"[LLM] Summarized {len(turns)} old turns in {time.perf_counter() - start:.2f}s ({self.history.summary_tokens} tokens)")
+        return True
+
+    # --- Speculation on partial transcripts ---
+    def prefill(self, partial_text, should_stop=None):
+        """Evaluate the prompt for a partial question while the speaker is still talking.
+
+        llama_cpp keeps the KV cache of the last call and reuses the prefix it
+        shares with the next one, so the final question only pays for the words
+        that were not spoken yet. No-op for transformers models.
+        """
+        if self.model_type != "llama_cpp" or not partial_text:
+            return False
+        messages = self.history.messages() + [{"role": "user", "content": partial_text}]
+        start = time.perf_counter()
+        self._complete(messages, max_tokens=1, should_stop=should_stop)
+        print(f"[LLM] Prefilled partial question in {time.perf_counter() - start:.2f}s: {partial_text}")
+        return True
+
+    def speculate(self, partial_text, should_stop=None):
+        """Answer a partial question in the background, without touching history or the UI.
+
+        generate_response() replays the answer if the final question turns out
+        to be the same one; otherwise it is discarded (on llama_cpp the prompt
+        prefix it evaluated is still reused).
+        """
+        if not partial_text:
+            return False
+        messages = self.history.messages() + [{"role": "user", "content": partial_text}]
+        start = time.perf_counter()
+        response = self._complete(messages, max_tokens=self.max_new_tokens, temperature=0.7, should_stop=should_stop)
+        if response is None:
+            return False # Interrupted by a newer partial or the final question
+        self.speculation = (normalize_question(partial_text), self.history.messages(), response)
+        print(f"[LLM] Speculative answer ready in {time.perf_counter() - start:.2f}s: {partial_text}")
+        return True
+
+    def _take_speculation(self, user_text):
+        speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return None
+        norm, messages, response = speculation
+        # Only valid for the same question asked in the same conversation state
+        if norm != normalize_question(user_text) or messages != self.history.messages():
+            print("[LLM] Discarding speculative answer")
+            return None
+        return response
+
+    def _replay_cached(self, user_text, response, stream_callback=None, stats_callback=None, speculative=False):
+        # Same path as a generated answer, so the UI and history cannot tell the difference
+        self.history.add("user", user_text)
+        stats = GenerationStats(self.model_path)
+        if speculative:
+            print("[LLM] Using speculative answer")
+            stats.speculative = True
+        else:
+            print("[LLM] Answer cache hit")
+            stats.cached = True
+        start_time = time.perf_counter()
+        if stream_callback:
+            for line in response.splitlines(keepends=True):
+                stream_callback(line)
+        stats.total_time = time.perf_counter() - start_time
+        # Not added to session_stats: it would skew the model's TTFT figures
+        self.last_stats = stats
+        if stats_callback:
+            stats_callback(stats)
+        self.history.add("assistant", response)
+        return response
+
+    def generate_response(self, user_text, stream_callback=None, stats_callback=None, should_stop=None, use_cache=True):
+        # should_stop: optional callable polled once per generated token; when it
+        # returns True generation stops after the current decode step.
+        # use_cache=False always generates (typed corrections); the new answer replaces the cached one
         if not user_text:
             return ""
 
-        self.history.append({"role": "user", "content": user_text})
+        speculative = self._take_speculation(user_text)
+        if speculative is not None:
+            if self.answer_cache is not None:
+                self.answer_cache.put(user_text, self.model_path, self.system_prompt, speculative)
+            return self._replay_cached(user_text, speculative, stream_callback, stats_callback, speculative=True)
+
+        if self.answer_cache is not None and use_cache:
+            cached = self.answer_cache.get(user_text, self.model_path, self.system_prompt)
+            if cached is not None:
+                return self._replay_cached(user_text, cached, stream_callback, stats_callback)
+
+        self.history.add("user", user_text)
         
         print(f"[LLM] Generating response...")
-        start_time = time.time()
+        stats = GenerationStats(self.model_path)
+        prefill = _PrefillProbe()
+        start_time = time.perf_counter()
+        first_token_time = None
+        last_token_time = None
         response = ""
         
         if self.model_type == "llama_cpp":
             # Llama.cpp generation
             stream = self.model.create_chat_completion(
-                messages=self.history,
-                max_tokens=1024,
+                messages=self.history.messages(),
+                max_tokens=self.max_new_tokens,
                 temperature=0.7,
-                stream=True
+                stream=True,
+                logits_processor=LogitsProcessorList([prefill])
             )
             
             print("[LLM] Stream: ", end="", flush=True)
             for chunk in stream:
+                if should_stop and should_stop():
+                    stats.cancelled = True
+                    break # Leaving the generator stops llama_cpp before the next decode
                 if 'content' in chunk['choices'][0]['delta']:
                     token = chunk['choices'][0]['delta']['content']
+                    last_token_time = time.perf_counter()
+                    if first_token_time is None:
+                        first_token_time = last_token_time
                     print(token, end="", flush=True)
                     response += token
                     if stream_callback:
                         stream_callback(token)
             print() # Newline after stream
+
+            # Count with the model's own tokenizer, not by words
+            if response:
+                stats.generated_tokens = len(self.model.tokenize(response.encode("utf-8"), add_bos=False))
             
         else:
             # Transformers generation (Streaming with TextIteratorStreamer)
-            from transformers import TextIteratorStreamer
+            from transformers import TextIteratorStreamer, LogitsProcessorList as HFLogitsProcessorList
             streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
             
             text = self.tokenizer.apply_chat_template(
-                self.history,
+                self.history.messages(),
                 tokenize=False,
                 add_generation_prompt=True
             )
@@ -119,20 +626,35 @@ class LLM:
 
             generation_kwargs = dict(
                 inputs=model_inputs.input_ids,
-                max_new_tokens=1024,
+                max_new_tokens=self.max_new_tokens,
                 do_sample=True,
                 temperature=0.7,
                 attention_mask=model_inputs.attention_mask,
                 pad_token_id=self.tokenizer.eos_token_id,
-                streamer=streamer
+                streamer=streamer,
+                logits_processor=HFLogitsProcessorList([prefill]),
+                stopping_criteria=_stopping_criteria(should_stop) if should_stop else None
             )
 
+            stats.prompt_tokens = int(model_inputs.input_ids.shape[1])
+            output = {}
+
+            def run_generate():
+                output["ids"] = self.model.generate(**generation_kwargs)
+
             # Run generation in a separate thread so we can iterate streamer
-            thread = threading.Thread(target=self.model.generate, kwargs=generation_kwargs)
+            thread = threading.Thread(target=run_generate)
             thread.start()
 
             print("[LLM] Stream: ", end="", flush=True)
             for token in streamer:
+                if should_stop and should_stop():
+                    # StoppingCriteria ends generate() after this step
+                    stats.cancelled = True
+                    break
+                last_token_time = time.perf_counter()
+                if first_token_time is None:
+                    first_token_time = last_token_time
                 print(token, end="", flush=True)
                 response += token
                 if stream_callback:
@@ -141,16 +663,38 @@ class LLM:
             thread.join()
             print() # Newline
 
-        end_time = time.time()
-        duration = end_time - start_time
+            # Exact count of generated ids (includes EOS if the model stopped)
+            if "ids" in output:
+                stats.generated_tokens = int(output["ids"].shape[1]) - stats.prompt_tokens
+
+        end_time = time.perf_counter()
+        stats.total_time = end_time - start_time
+        if prefill.time is not None:
+            # Counted by the model itself, chat template included (transformers already set it)
+            stats.prompt_tokens = prefill.prompt_tokens
+            stats.prompt_eval_time = prefill.time - start_time
+        if first_token_time is not None:
+            stats.ttft = first_token_time - start_time
+            stats.decode_time = last_token_time - first_token_time
         
-        # Estimate TPS (Tokens Per Second)
-        # Note: simplistic token count for stats
-        num_tokens = len(response.split()) * 1.3 # Rough estimate
-        tps = num_tokens / duration if duration > 0 else 0
-        print(f"[LLM] Finished in {duration:.2f}s (~{tps:.2f} t/s)")
+        if stats.cancelled:
+            print("[LLM] Generation cancelled")
+        print(f"[LLM] Finished: {stats}")
+        self.last_stats = stats
+        self.session_stats.add(stats)
+        if stats_callback:
+            stats_callback(stats)
+
+        if stats.cancelled:
+            # A cut-off answer is neither worth serving again nor something to build on:
+            # the question leaves the history with it
+            self.history.drop_last()
+            return response
+
+        if self.answer_cache is not None:
+            self.answer_cache.put(user_text, self.model_path, self.system_prompt, response)
         
-        self.history.append({"role": "assistant", "content": response})
+        self.history.add("assistant", response)
         return response
 
     def reload_model(self, model_path):
@@ -158,9 +702,10 @@ class LLM:
         print(f"Reloading LLM: {model_path}...")
         
         # Reset history
-        self.history = [
-            {"role": "system", "content": "You are a helpful AI assistant. Answer concisely."}
-        ]
+        self.history.clear()
+        self.speculation = None
+        if self.answer_cache is not None:
+            self.answer_cache.close()
         
         # Clean up old model
         if hasattr(self, 'model'):
@@ -169,7 +714,9 @@ class LLM:
             del self.tokenizer
             
         gc.collect()
-        if torch.cuda.is_available():
+        torch = sys.modules.get("torch") # Only loaded if a transformers model was used
+        if torch is not None and torch.cuda.is_available():
             torch.cuda.empty_cache()
             
-        return self.__init__(model_path) # Re-init with new path logic
+        self.__init__(model_path, **self.options) # Same context size, budgets and load options
+        self.warmup()
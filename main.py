@@ -1,204 +1,74 @@
 
+import os
 import sys
-import threading
-import queue
-import time
-import numpy as np
-import re
+from latency import tracer, startup # First: starts the startup clock
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QObject, pyqtSignal, QThread, Qt
+from PyQt6.QtCore import QObject, pyqtSignal, QThread, Qt, QTimer
 
 from overlay import TransparentOverlay
-from audio_capture import AudioCapture
-from stt import SpeechToText
-from llm import LLM
+from pipeline import Listener, Thinker
+from session_store import SessionStore, HISTORY_DIR
 
-# --- Worker for LLM (Thinker) ---
-class LLMWorker(QObject):
-    response_ready = pyqtSignal(str) # Final response
+# --- Qt workers: the pipeline's events as signals of the same name ---
+class LLMWorker(Thinker, QObject):
+    response_ready = pyqtSignal(str) # "ok" or "cancelled"
     token_ready = pyqtSignal(str)    # Streaming tokens
     status_update = pyqtSignal(str)
-    
-    def __init__(self):
-        super().__init__()
-        self.queue = queue.Queue()
-        self.running = True
-        self.llm = None
-        
-    def run(self):
-        try:
-            # Initialize LLM
-            self.status_update.emit("Loading LLM...")
-            # Point to the local folder where we are downloading the model
-            model_path = r"local_models\qwen2.5-coder-3b-instruct-q4_k_m.gguf"
-            self.llm = LLM(model_path)
-            self.status_update.emit("LLM Ready")
-        except Exception as e:
-            self.status_update.emit(f"LLM Error: {str(e)}")
-            return
-
-        while self.running:
-            try:
-                # Wait for question (blocking 1s timeout to check running)
-                user_text = self.queue.get(timeout=1.0)
-                
-                # Process Question
-                self.status_update.emit("Thinking...")
-                
-                # Define callback to emit tokens
-                def stream_callback(token):
-                    self.token_ready.emit(token)
-
-                # Generate with streaming
-                response = self.llm.generate_response(user_text, stream_callback=stream_callback)
-                
-                # Signal completion (optional, or just ready)
-                self.response_ready.emit("") # Empty string or special signal to say "Done" if needed by UI to finalize
-                self.status_update.emit("Listening...")
-                self.status_update.emit("Listening...")
-                
-                self.queue.task_done()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"LLM Processing Error: {e}")
-                self.status_update.emit("Error generating response")
-
-    def stop(self):
-        self.running = False
+    generation_started = pyqtSignal(int) # Utterance ID (latency tracing)
 
-    def add_question(self, text):
-        self.queue.put(text)
+    def publish(self, event, *args):
+        getattr(self, event).emit(*args)
+        super().publish(event, *args)
 
 
-# --- Worker for Audio (Listener) ---
-class AudioWorker(QObject):
+class AudioWorker(Listener, QObject):
     text_ready = pyqtSignal(str, str) # role, text
+    text_revised = pyqtSignal(str, str) # role, final transcript replacing a preview
+    utterance_ready = pyqtSignal(str, int) # text, utterance ID (for the LLM queue)
+    partial_ready = pyqtSignal(str, int)   # Stable partial text, utterance ID (speculative prefill)
     status_update = pyqtSignal(str)
-    
-    def __init__(self):
-        super().__init__()
-        self.running = True
-    
-    def run(self):
-        try:
-            self.audio_capture = AudioCapture()
-            self.status_update.emit("Loading Whisper...")
-            # Switch to faster-whisper (base/tiny managed in stt.py)
-            self.stt = SpeechToText(model_size="base") 
-            self.status_update.emit("Listening...")
-        except Exception as e:
-            self.status_update.emit(f"Audio Error: {str(e)}")
-            return
-
-        self.audio_capture.start()
-
-        audio_buffer = []
-        silence_threshold = 0.0003
-        silence_frames = 0
-        is_speaking = False
-        preview_counter = 0
-        
-        # Audio processing loop
-        while self.running:
-            chunk = self.audio_capture.get_audio_chunk()
-            if chunk is None:
-                time.sleep(0.01)
-                continue
-            
-            # Digital Gain
-            chunk = chunk * 5.0
-            
-            energy = np.mean(np.abs(chunk))
-            
-            if energy > silence_threshold:
-                is_speaking = True
-                silence_frames = 0
-                audio_buffer.append(chunk)
-                
-                # Live Preview & Question Detection Logic
-                preview_counter += 1
-                if preview_counter >= 5: # Check every ~0.3s (Faster detection)
-                    preview_counter = 0
-                    try:
-                        temp_audio = np.concatenate(audio_buffer)
-                        partial_text = self.stt.transcribe(temp_audio)
-                        
-                        if partial_text:
-                            # 1. Update UI Preview
-                            display_text = (partial_text[-40:] + '..') if len(partial_text) > 40 else partial_text
-                            self.status_update.emit(f"👂 {display_text}")
-                            
-                            # 2. Check for Question Mark (Trigger)
-                            # "Barge-in" - if we detect a full question, fire it off immediately!
-                            if "?" in partial_text[-5:]: # Ends with ? (or close to end)
-                                print(f"[Audio] Question Detected: {partial_text}")
-                                # Send to Main Thread -> LLM
-                                self.text_ready.emit("User", partial_text)
-                                
-                                # Clear buffer to start listening for NEXT sentence immediately
-                                audio_buffer = [] 
-                                is_speaking = False # Reset state
-                                self.status_update.emit("Listening for next...")
-                                
-                    except Exception:
-                        pass
-                        
-            else:
-                if is_speaking:
-                    silence_frames += 1
-                    audio_buffer.append(chunk)
-                    
-                    # Silence duration (~0.7s)
-                    if silence_frames > 12: 
-                        # Process full phrase if not already caught by ? trigger
-                        if len(audio_buffer) > 0:
-                            self.process_buffer(audio_buffer)
-                            audio_buffer = []
-                        
-                        is_speaking = False
-                        silence_frames = 0
-                        preview_counter = 0
-                        self.status_update.emit("Listening...")
-                else:
-                    if len(audio_buffer) > 5:
-                        audio_buffer.pop(0)
-                    audio_buffer.append(chunk)
-
-    def process_buffer(self, buffer):
-        try:
-            audio_data = np.concatenate(buffer)
-            text = self.stt.transcribe(audio_data)
-            if text and len(text.strip()) > 1:
-                print(f"[Audio] Final Phrase: {text}")
-                self.text_ready.emit("User", text)
-        except Exception as e:
-            print(f"Transcription error: {e}")
 
-    def stop(self):
-        self.running = False
-        if hasattr(self, 'audio_capture'):
-            self.audio_capture.stop()
+    def publish(self, event, *args):
+        getattr(self, event).emit(*args)
+        super().publish(event, *args)
 
 
 # --- Main Application Logic ---
 if __name__ == "__main__":
+    startup.mark("imports")
+    # --multiprocess: capture+VAD, STT and the LLM each get their own process
+    # (see multiproc.py); the signals below stay the same either way
+    multiprocess = "--multiprocess" in sys.argv
+    # --low-latency: 20 ms capture blocks and a shorter end-of-speech hangover (see Listener)
+    low_latency = "--low-latency" in sys.argv
+    # The LLM's conversation is saved on exit; --resume continues it (history and KV state)
+    llm_options = {"conversation_path": os.path.join(HISTORY_DIR, "conversation.state"),
+                   "resume": "--resume" in sys.argv}
     app = QApplication(sys.argv)
     window = TransparentOverlay()
+
+    # Every turn goes to history/sessions.db (written off the UI thread), searchable from the history page
+    sessions = SessionStore()
+    window.set_session_store(sessions)
     
     # 1. Setup Audio Thread
     audio_thread = QThread()
-    audio_worker = AudioWorker()
+    if multiprocess:
+        from multiproc import AudioProcess, LLMProcess
+        audio_worker = AudioProcess(low_latency=low_latency)
+    else:
+        audio_worker = AudioWorker(low_latency=low_latency)
     audio_worker.moveToThread(audio_thread)
     
     audio_thread.started.connect(audio_worker.run)
     audio_worker.status_update.connect(window.update_status)
     audio_worker.text_ready.connect(window.append_message) # Show user text
+    audio_worker.text_revised.connect(window.revise_message)
+    audio_worker.text_ready.connect(sessions.add_turn)
     
     # 2. Setup LLM Thread
     llm_thread = QThread()
-    llm_worker = LLMWorker()
+    llm_worker = LLMProcess(**llm_options) if multiprocess else LLMWorker(**llm_options)
     llm_worker.moveToThread(llm_thread)
     
     llm_thread.started.connect(llm_worker.run)
@@ -223,8 +93,33 @@ if __name__ == "__main__":
     # No, that's messy.
     
     # Let's just modify the response_ready connection to "end_streaming_message"
-    llm_worker.response_ready.connect(lambda x: window.end_streaming_message())
-    llm_worker.token_ready.connect(window.stream_token)
+    # Latency tracing: the UI marks when tokens actually got rendered
+    ui_trace = {"uid": None}
+
+    def handle_generation_started(uid):
+        ui_trace["uid"] = uid
+
+    def handle_token(token):
+        window.stream_token(token)
+
+    def handle_tokens_rendered():
+        # Tokens are drawn in batches (see TransparentOverlay.flush_tokens)
+        tracer.mark(ui_trace["uid"], "ui_first_token")
+
+    def handle_response(status):
+        window.end_streaming_message()
+        tracer.mark(ui_trace["uid"], "ui_done")
+        trace = tracer.finish(ui_trace["uid"], status=status)
+        ui_trace["uid"] = None
+        if status == "cancelled":
+            return # Dropped from the LLM history too; the session must not remember it as an answer
+        sessions.add_turn("Assistant", window.current_stream_content,
+                          timings=trace["intervals_ms"] if trace else None)
+
+    llm_worker.generation_started.connect(handle_generation_started)
+    llm_worker.response_ready.connect(handle_response)
+    llm_worker.token_ready.connect(handle_token)
+    window.tokens_rendered.connect(handle_tokens_rendered)
     
     # We need to call window.start_streaming_message("Assistant") sometime.
     # LLMWorker should emit it.
@@ -254,16 +149,20 @@ if __name__ == "__main__":
     # Let's create a bridge slot in LLMWorker or connect signal directly? 
     # We need to extract the text string from (role, text) signal of audio_worker
     
-    def bridge_audio_to_llm(role, text):
+    def bridge_audio_to_llm(text, uid):
         # We only send to LLM if it's worth it? 
         # User wants "answer all questions".
         # So we send everything that looks like a sentence/question.
         if len(text) > 2:
-            llm_worker.add_question(text)
+            llm_worker.add_question(text, uid)
+        else:
+            tracer.finish(uid, status="filtered")
             
             
             
-    audio_worker.text_ready.connect(bridge_audio_to_llm)
+    audio_worker.utterance_ready.connect(bridge_audio_to_llm)
+    # Stable partials go straight to the worker (add_partial only swaps a tuple)
+    audio_worker.partial_ready.connect(llm_worker.add_partial, Qt.ConnectionType.DirectConnection)
 
     # 4. Connect Correction Signal
     # Correction signal only sends 'text', but bridge expects 'role, text'.
@@ -271,15 +170,21 @@ if __name__ == "__main__":
     def handle_correction(text):
          # Treat correction as user input
          if len(text) > 0:
-             llm_worker.add_question(text)
+             sessions.add_turn("User", text)
+             llm_worker.add_question(text, force=True)
              
     window.correction_ready.connect(handle_correction)
 
-    # Start Threads
-    audio_thread.start()
-    llm_thread.start()
-    
     window.show()
+
+    # Start Threads once the event loop runs, so the overlay paints (and takes
+    # typed corrections) before model loading competes for the GIL
+    def start_workers():
+        startup.mark("window_shown")
+        audio_thread.start()
+        llm_thread.start()
+
+    QTimer.singleShot(0, start_workers)
     
     # Cleanup on exit
     exit_code = app.exec()
@@ -289,5 +194,7 @@ if __name__ == "__main__":
     llm_thread.quit()
     audio_thread.wait()
     llm_thread.wait()
+    tracer.close() # Writes logs/latency_summary.json and prints p50/p95/p99
+    sessions.close()
     sys.exit(exit_code)
 
@@ -0,0 +1,130 @@
+"""Incremental Markdown for streamed answers: fenced code blocks and **bold**.
+
+StreamingMarkdown cuts the text into blocks as tokens arrive: a text block
+closes at each newline, a code block at its closing fence. Each closed
+block is rendered once; the open tail is shown as plain text until it
+closes. Code block HTML is cached, so re-rendering a finished message only
+pays for the text around it.
+"""
+import html
+import re
+from functools import lru_cache
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+    HAS_PYGMENTS = True
+except ImportError:
+    HAS_PYGMENTS = False
+
+FENCE = "```"
+
+class StreamingMarkdown:
+    """Splits a growing text into closed ("text", s) and ("code", lang, code) blocks."""
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0          # Everything before this was returned as blocks (or is a fence line)
+        self.block_start = 0  # Raw start of the block still open
+        self.scan = 0         # Where the next fence search starts
+        self.code_lang = None # Language of the open code block; None outside code
+
+    def tail(self):
+        """Raw text of the block still open."""
+        return self.text[self.block_start:]
+
+    def feed(self, chunk):
+        """Adds streamed text; returns the blocks it closed."""
+        self.text += chunk
+        blocks = []
+        while True:
+            fence = self.text.find(FENCE, self.scan)
+            if self.code_lang is not None:
+                if fence < 0:
+                    # A fence may be split across chunks
+                    self.scan = max(self.pos, len(self.text) - len(FENCE) + 1)
+                    break
+                blocks.append(("code", self.code_lang, self.text[self.pos:fence]))
+                self.pos = self.block_start = self.scan = fence + len(FENCE)
+                self.code_lang = None
+                continue
+
+            header_end = self.text.find("\n", fence) if fence >= 0 else -1
+            if fence >= 0 and header_end >= 0:
+                # Opening fence line complete: it names the language
+                if fence > self.pos:
+                    blocks.append(("text", self.text[self.pos:fence]))
+                self.code_lang = self.text[fence + len(FENCE):header_end].strip()
+                self.block_start = fence
+                self.pos = self.scan = header_end + 1
+                continue
+
+            end = fence if fence >= 0 else len(self.text)
+            line_end = self.text.rfind("\n", self.pos, end)
+            if line_end >= 0:
+                blocks.append(("text", self.text[self.pos:line_end + 1]))
+                self.pos = self.block_start = line_end + 1
+            self.scan = fence if fence >= 0 else max(self.pos, len(self.text) - len(FENCE) + 1)
+            break
+        return blocks
+
+    def finish(self):
+        """Closes whatever is still open (an unterminated code block counts as code)."""
+        if self.code_lang is not None:
+            blocks = [("code", self.code_lang, self.text[self.pos:])]
+        elif self.block_start < len(self.text):
+            blocks = [("text", self.text[self.block_start:])]
+        else:
+            blocks = []
+        self.pos = self.block_start = self.scan = len(self.text)
+        self.code_lang = None
+        return blocks
+
+
+def text_html(text):
+    text = html.escape(text)
+    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
+    return text.replace('\n', '<br>')
+
+@lru_cache(maxsize=256)
+def code_html(lang, code):
+    """Code box HTML, highlighted with Pygments when it knows the language; cached per block."""
+    code = code.strip('\n')
+    content = None
+    if HAS_PYGMENTS and lang:
+        try:
+            lexer = get_lexer_by_name(lang)
+            content = highlight(code, lexer, HtmlFormatter(nowrap=True, noclasses=True, style="monokai"))
+        except ClassNotFound:
+            pass
+    if content is None:
+        content = html.escape(code)
+    content = content.rstrip('\n').replace('\n', '<br>')
+
+    # Use Table for Code Box (Qt supports this better than div/pre styling)
+    return f"""
+    <table width="100%" cellpadding="10" cellspacing="0" style="background-color: #2b2b2b; color: #a9b7c6; border-radius: 5px; margin-top: 10px; margin-bottom: 10px;">
+        <tr>
+            <td>
+                <pre style="font-family: Consolas, monospace; margin: 0;">{content}</pre>
+            </td>
+        </tr>
+    </table>
+    """
+
+def is_plain(block):
+    """True if the block renders exactly as its raw text (no code, no **bold**)."""
+    return block[0] == "text" and "**" not in block[1]
+
+def block_html(block):
+    if block[0] == "code":
+        return code_html(block[1], block[2])
+    return text_html(block[1])
+
+def render_markdown(text):
+    """HTML for a whole message; code blocks come from the cache when already rendered."""
+    md = StreamingMarkdown()
+    blocks = md.feed(text) + md.finish()
+    return "".join(block_html(b) for b in blocks)
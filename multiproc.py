@@ -0,0 +1,398 @@
+"""Optional multi-process topology (python main.py --multiprocess).
+
+    capture + VAD process --shared-memory audio ring + per-block VAD decisions--> STT process
+    STT process, LLM process --result queues--> Qt front end (this process)
+
+AudioProcess and LLMProcess have the same signals and methods as AudioWorker
+and LLMWorker, so main.py wires them up the same way. The STT and LLM
+processes run the Qt-free Listener and Thinker (pipeline.py); their events,
+latency marks and startup timings are forwarded over a result queue.
+"""
+import contextlib
+import multiprocessing as mp
+import multiprocessing.connection
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from audio_buffer import AudioRingBuffer
+from latency import tracer, startup
+from pipeline import Listener
+from vad import VAD, create_vad
+
+# Qt and CUDA do not survive fork(); spawn everywhere, like Windows does anyway
+_ctx = mp.get_context("spawn")
+
+class SharedAudioRing(AudioRingBuffer):
+    """AudioRingBuffer whose samples live in shared memory.
+
+    One process writes (capture), others read absolute sample ranges with
+    read(). The write count is published in a header after every write, once
+    the samples and their mirror copy are in place.
+    """
+    HEADER_BYTES = 64
+
+    def __init__(self, capacity, name=None):
+        capacity = int(capacity)
+        self.owner = name is None
+        if self.owner:
+            size = self.HEADER_BYTES + capacity * 2 * np.dtype(np.float32).itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                # Only the owner may unlink it (Python 3.13+; older versions warn at exit)
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+        self._header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        storage = np.ndarray((capacity * 2,), dtype=np.float32, buffer=self.shm.buf, offset=self.HEADER_BYTES)
+        super().__init__(capacity, storage=storage)
+        if self.owner:
+            self._header[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, chunk, gain=None):
+        super().write(chunk, gain)
+        self._header[0] = self.written
+
+    def published(self):
+        return int(self._header[0])
+
+    def read(self, start, end):
+        """Zero-copy view of absolute samples [start, end), or None if already overwritten.
+
+        The view stays valid until the writer laps it (capacity samples later),
+        so copy it out promptly.
+        """
+        n = end - start
+        if n <= 0 or n > self.capacity or self.published() - start > self.capacity:
+            return None
+        pos = start % self.capacity
+        return self._data[pos:pos + n]
+
+    def close(self):
+        self._data = self._header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass # A view is still alive somewhere; released with the process
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedRingSource:
+    """AudioWorker audio source in the STT process: blocks announced by the capture process."""
+
+    def __init__(self, ring, blocks, sample_rate):
+        self.ring = ring
+        self.blocks = blocks
+        self.sample_rate = sample_rate
+        self.vad_result = (np.zeros(0, dtype=bool), np.zeros(0, dtype=bool), False)
+        self.block_time = None # When the capture process recorded the last block (perf_counter is system-wide)
+        self.dropped = 0 # Samples the capture process overwrote before we got to them
+        self.error = None # Why the capture process stopped recording, if it failed
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.blocks.put(None) # Wakes a waiting get_audio_chunk()
+
+    def get_audio_chunk(self):
+        while True:
+            item = self.blocks.get()
+            if item is None:
+                return None
+            if item[0] == "error":
+                self.error = item[1]
+                continue
+            end, n, block_time, flags, states, triggered = item
+            chunk = self.ring.read(end - n, end)
+            if chunk is not None:
+                self.vad_result = (flags, states, triggered)
+                self.block_time = block_time
+                return chunk
+            self.dropped += n
+            print(f"[Audio] STT fell behind capture, {self.dropped} samples dropped")
+
+
+class RemoteVAD(VAD):
+    """Replays the decisions the capture process made for each block."""
+
+    def __init__(self, source, sample_rate=16000):
+        self.source = source
+        super().__init__(sample_rate)
+
+    def process(self, block):
+        was_triggered = self.triggered
+        self.frame_flags, self.frame_states, self.triggered = self.source.vad_result
+        if self.triggered and not was_triggered:
+            return "start"
+        if was_triggered and not self.triggered:
+            return "end"
+        return None
+
+
+class TracerProxy:
+    """Stands in for latency.tracer in a worker process; the front end records."""
+
+    def __init__(self, results, first_id):
+        self.results = results
+        self.next_id = first_id # Disjoint from the front end's own IDs
+        self.enabled = True
+
+    def _send(self, method, *args, **kwargs):
+        self.results.put(("trace", method, args, kwargs))
+
+    def new_utterance(self):
+        uid = self.next_id
+        self.next_id += 1
+        self._send("new_utterance", uid)
+        return uid
+
+    def mark(self, uid, stage, t=None):
+        if uid is not None:
+            self._send("mark", uid, stage, time.perf_counter() if t is None else t)
+
+    def add(self, uid, key, value):
+        if uid is not None:
+            self._send("add", uid, key, value)
+
+    def set(self, uid, key, value):
+        if uid is not None:
+            self._send("set", uid, key, value)
+
+    def finish(self, uid, **fields):
+        if uid is not None:
+            self._send("finish", uid, **fields)
+
+
+class StartupProxy:
+    """Stands in for latency.startup in a worker process."""
+
+    def __init__(self, results):
+        self.results = results
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.results.put(("startup", name, start, time.perf_counter(), mp.current_process().name))
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.results.put(("startup", name, now, now, mp.current_process().name))
+
+
+def _forward_events(core, results):
+    # Re-emitted by the front end as the Qt signal of the same name
+    core.subscribe(lambda event, *args: results.put(("signal", event, args)))
+
+def _use_proxies(results, first_id):
+    # Listener and Thinker look up these module globals at call time
+    import pipeline
+    pipeline.tracer = TracerProxy(results, first_id)
+    pipeline.startup = StartupProxy(results)
+    return pipeline
+
+
+# --- Child process entry points ---
+def _capture_main(ring_name, capacity, blocks, stop_event, vad_backend, source_path, gain, block_size, hangover_ms):
+    ring = SharedAudioRing(capacity, name=ring_name)
+    if source_path:
+        from file_capture import FileAudioCapture
+        capture = FileAudioCapture(source_path, block_size=block_size)
+    else:
+        from audio_capture import AudioCapture
+        capture = AudioCapture(block_size=block_size)
+    vad = create_vad(vad_backend, sample_rate=capture.sample_rate, hangover_ms=hangover_ms)
+
+    def stop_on_event():
+        stop_event.wait()
+        capture.stop() # Wakes the loop below
+
+    stopper = threading.Thread(target=stop_on_event, daemon=True)
+    stopper.start()
+    capture.start()
+    try:
+        while True:
+            chunk = capture.get_audio_chunk()
+            if chunk is None:
+                break
+            # Gain and VAD run here, away from Whisper and the LLM
+            ring.write(chunk, gain=gain)
+            vad.process(ring.view(len(chunk)))
+            blocks.put((ring.written, len(chunk), capture.block_time, vad.frame_flags, vad.frame_states, vad.triggered))
+    finally:
+        if getattr(capture, "error", None):
+            blocks.put(("error", capture.error)) # Reported by the Listener in the STT process
+        blocks.put(None) # End of stream (a replayed file ran out) or stopped
+        stop_event.set()
+        stopper.join()
+        ring.close()
+
+def _stt_main(ring_name, capacity, blocks, commands, results, sample_rate):
+    pipeline = _use_proxies(results, first_id=1 << 20)
+    ring = SharedAudioRing(capacity, name=ring_name)
+    source = SharedRingSource(ring, blocks, sample_rate)
+    worker = pipeline.Listener(vad_backend=RemoteVAD(source, sample_rate), audio_source=source, gain=None)
+    _forward_events(worker, results)
+
+    def wait_for_stop():
+        while commands.get()[0] != "stop":
+            pass
+        worker.stop()
+
+    threading.Thread(target=wait_for_stop, daemon=True).start()
+    try:
+        worker.run()
+    finally:
+        ring.close()
+        results.put(("exit",))
+
+def _llm_main(commands, results, worker_kwargs):
+    pipeline = _use_proxies(results, first_id=2 << 20)
+    worker = pipeline.Thinker(**worker_kwargs)
+    _forward_events(worker, results)
+
+    def read_commands():
+        while True:
+            cmd, *args = commands.get()
+            if cmd == "question":
+                worker.add_question(*args)
+            elif cmd == "partial":
+                worker.add_partial(*args)
+            elif cmd == "stop":
+                worker.stop()
+                return
+
+    threading.Thread(target=read_commands, daemon=True).start()
+    try:
+        worker.run()
+    finally:
+        results.put(("exit",))
+
+
+# --- Front-end stand-ins for AudioWorker / LLMWorker ---
+class _ProcessWorker(QObject):
+    # Subclasses start their processes in _start() and declare the worker's signals
+
+    def __init__(self):
+        super().__init__()
+        self.running = True
+        self.commands = _ctx.Queue()
+        self.results = _ctx.Queue()
+        self.processes = []
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _cleanup(self):
+        pass
+
+    def _watch_processes(self):
+        # Ends run() even if no child got to say goodbye (crash, kill)
+        pending = [p.sentinel for p in self.processes]
+        while pending:
+            for ready in mp.connection.wait(pending):
+                pending.remove(ready)
+        self.results.put(("exit",))
+
+    def run(self):
+        # Runs on the QThread: turns child messages back into signals and trace records
+        self._start()
+        threading.Thread(target=self._watch_processes, daemon=True).start()
+        while True:
+            msg = self.results.get()
+            kind = msg[0]
+            if kind == "signal":
+                getattr(self, msg[1]).emit(*msg[2])
+            elif kind == "trace":
+                getattr(tracer, msg[1])(*msg[2], **msg[3])
+            elif kind == "startup":
+                startup._record(*msg[1:])
+            elif kind == "exit":
+                break
+        for p in self.processes:
+            p.join(timeout=5)
+        self._cleanup()
+
+    def stop(self):
+        self.running = False
+        self.commands.put(("stop",))
+
+
+class AudioProcess(_ProcessWorker):
+    text_ready = pyqtSignal(str, str)
+    text_revised = pyqtSignal(str, str)
+    utterance_ready = pyqtSignal(str, int)
+    partial_ready = pyqtSignal(str, int)
+    status_update = pyqtSignal(str)
+
+    def __init__(self, vad_backend="energy", audio_path=None, sample_rate=16000, gain=5.0, ring_seconds=30,
+                 low_latency=False):
+        super().__init__()
+        self.vad_backend = vad_backend
+        # Same block size and VAD hangover as a Listener(low_latency=...) recording itself
+        self.block_size = 320 if low_latency else 4096
+        self.hangover_ms = Listener.LOW_LATENCY_HANGOVER_MS if low_latency else Listener.HANGOVER_MS
+        self.audio_path = audio_path # Replay a file/folder instead of the live device
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.capacity = sample_rate * ring_seconds
+        self.stop_event = _ctx.Event()
+        self.ring = None
+
+    def _start(self):
+        self.ring = SharedAudioRing(self.capacity)
+        blocks = _ctx.Queue()
+        self.processes = [
+            _ctx.Process(target=_capture_main, name="capture", daemon=True,
+                         args=(self.ring.name, self.capacity, blocks, self.stop_event, self.vad_backend,
+                               self.audio_path, self.gain, self.block_size, self.hangover_ms)),
+            _ctx.Process(target=_stt_main, name="stt", daemon=True,
+                         args=(self.ring.name, self.capacity, blocks, self.commands, self.results, self.sample_rate)),
+        ]
+        for p in self.processes:
+            p.start()
+
+    def stop(self):
+        self.stop_event.set()
+        super().stop()
+
+    def _cleanup(self):
+        if self.ring is not None:
+            self.ring.close()
+
+
+class LLMProcess(_ProcessWorker):
+    response_ready = pyqtSignal(str)
+    token_ready = pyqtSignal(str)
+    status_update = pyqtSignal(str)
+    generation_started = pyqtSignal(int)
+
+    def __init__(self, **worker_kwargs):
+        super().__init__()
+        self.worker_kwargs = worker_kwargs # Passed to Thinker in the child
+
+    def _start(self):
+        self.processes = [_ctx.Process(target=_llm_main, name="llm", daemon=True,
+                                       args=(self.commands, self.results, self.worker_kwargs))]
+        self.processes[0].start()
+
+    def add_question(self, text, uid=None, force=False):
+        if uid is None:
+            # Typed corrections have no audio stages
+            uid = tracer.new_utterance()
+            tracer.set(uid, "source", "correction")
+        self.commands.put(("question", text, uid, force))
+
+    def add_partial(self, text, uid):
+        self.commands.put(("partial", text, uid))
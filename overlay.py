@@ -1,11 +1,16 @@
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout, 
-                             QWidget, QFrame, QHBoxLayout, QPushButton, QStackedLayout, QTextEdit, QDialog, QInputDialog)
-from PyQt6.QtCore import Qt, QPoint, pyqtSignal, QUrl, QSize
+                             QWidget, QFrame, QHBoxLayout, QPushButton, QStackedLayout, QTextEdit, QDialog, QInputDialog,
+                             QLineEdit)
+from PyQt6.QtCore import Qt, QPoint, pyqtSignal, QUrl, QSize, QTimer
 from PyQt6.QtGui import QFont, QDesktopServices, QPixmap, QPainter, QPainterPath, QCursor, QIcon, QTextCursor
 import os
+import time
 import ctypes
 from ctypes import wintypes
 
+from history_view import HistoryModel, HistoryView
+from markdown_stream import StreamingMarkdown, block_html, is_plain, render_markdown
+
 class DeveloperPopup(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -134,12 +139,25 @@ class DeveloperPopup(QDialog):
 class TransparentOverlay(QMainWindow):
     request_model_switch = pyqtSignal(str) # "3B" or "1.5B"
     correction_ready = pyqtSignal(str)     # Signal for corrected text
+    tokens_rendered = pyqtSignal()         # Buffered tokens were just drawn (latency tracing)
+
+    FLUSH_INTERVAL_MS = 33 # Streamed tokens are drawn at most ~30 times per second
 
     def __init__(self):
         super().__init__()
         self.oldPos = self.pos()
+        self.session_store = None # Set by set_session_store(); search then covers past sessions
+        self.last_rows = {}       # Role -> history row of its latest message (see revise_message)
+        self.live_user_end = None # End of the user bubble at the top of the live page
         self.initUI()
 
+        # Tokens arrive faster than it is worth re-laying out the documents:
+        # buffer them and insert once per view per frame
+        self.pending_tokens = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self._on_flush_timer)
+
     def initUI(self):
         # Window setup
         self.setWindowFlags(
@@ -296,15 +314,49 @@ class TransparentOverlay(QMainWindow):
         self.page_live.setStyleSheet(self._get_text_style())
         self.stacked_layout.addWidget(self.page_live)
         
-        # Page 2: History (Full Log)
-        self.page_history = QTextEdit()
-        self.page_history.setReadOnly(True)
-        # Enable Robust Interaction
-        self.page_history.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        self.page_history.setContextMenuPolicy(Qt.ContextMenuPolicy.DefaultContextMenu)
-        self.page_history.setTextInteractionFlags(Qt.TextInteractionFlag.TextEditorInteraction)
-        self.page_history.setFont(QFont("Segoe UI", 10))
-        self.page_history.setStyleSheet(self._get_text_style())
+        # Page 2: History (Full Log) with a search box over all sessions
+        self.page_history = QWidget()
+        self.page_history.setStyleSheet("background: transparent; border: none;")
+        history_layout = QVBoxLayout()
+        history_layout.setContentsMargins(10, 0, 0, 0)
+        history_layout.setSpacing(4)
+        self.page_history.setLayout(history_layout)
+
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search history...")
+        self.history_search.setClearButtonEnabled(True)
+        self.history_search.setFont(QFont("Segoe UI", 10))
+        self.history_search.setStyleSheet("""
+            QLineEdit {
+                background-color: rgba(255, 255, 255, 15);
+                color: white;
+                border: 1px solid rgba(255, 255, 255, 30);
+                border-radius: 8px;
+                padding: 4px 8px;
+                margin-right: 10px;
+            }
+        """)
+        # Search as you type, once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_history_search)
+        self.history_search.textChanged.connect(self.search_timer.start)
+        self.history_search.returnPressed.connect(self.run_history_search)
+        history_layout.addWidget(self.history_search)
+
+        # Raw messages live in the models; only visible bubbles are rendered (Ctrl+C copies one)
+        self.history_lists = QStackedLayout()
+        self.history_model = HistoryModel()
+        self.history_list = HistoryView(self.history_model, self._message_html)
+        self.search_model = HistoryModel()
+        self.search_list = HistoryView(self.search_model, self._message_html, follow=False)
+        for view in (self.history_list, self.search_list):
+            view.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+            view.setFont(QFont("Segoe UI", 10))
+            view.setStyleSheet(self._get_text_style())
+            self.history_lists.addWidget(view)
+        history_layout.addLayout(self.history_lists)
         self.stacked_layout.addWidget(self.page_history)
         
         self.container_layout.addWidget(self.stacked_widget)
@@ -314,7 +366,7 @@ class TransparentOverlay(QMainWindow):
 
     def _get_text_style(self):
         return """
-            QTextEdit {
+            QTextEdit, QListView {
                 background-color: transparent; 
                 color: white; 
                 border: none; 
@@ -400,111 +452,121 @@ class TransparentOverlay(QMainWindow):
             self.correction_ready.emit(text)
 
     def process_markdown(self, text):
-        import re
+        return render_markdown(text) # Code blocks already rendered while streaming come from the cache
+
+    def set_session_store(self, store):
+        """Lets the history search box look through every stored session (see session_store.py)."""
+        self.session_store = store
+
+    def run_history_search(self):
+        self.search_timer.stop()
+        query = self.history_search.text().strip()
+        if not query:
+            self.history_lists.setCurrentIndex(0)
+            return
+        if self.session_store is None:
+            # Nothing stored: jump between matches in this session
+            self.history_list.find_next(query)
+            return
+
+        t0 = time.perf_counter()
+        rows = self.session_store.search(query)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        self.search_model.set_messages(
+            (f"{role} · {time.strftime('%d %b %Y %H:%M', time.localtime(created))}", text, False)
+            for _, role, text, created in rows)
+        self.search_list.scrollToTop()
+        self.history_lists.setCurrentIndex(1)
+        self.update_status(f"{len(rows)} matches in {elapsed_ms:.0f} ms")
+
+    def _message_html(self, role, message, streaming=False):
+        """Bubble HTML for one message; a message still streaming is shown as plain text."""
         import html
-        
-        # Split by code blocks
-        parts = re.split(r'(```.*?```)', text, flags=re.DOTALL)
-        formatted_parts = []
-        
-        for part in parts:
-            if part.startswith('```') and part.endswith('```'):
-                # Code Block
-                content = part[3:-3].strip()
-                # Remove language identifier if present
-                if '\n' in content:
-                    first_line, rest = content.split('\n', 1)
-                    if ' ' not in first_line.strip() and len(first_line.strip()) < 15:
-                        content = rest
-                
-                content = html.escape(content)
-                content = content.replace('\n', '<br>')
-                
-                # Use Table for Code Box (Qt supports this better than div/pre styling)
-                code_html = f"""
-                <table width="100%" cellpadding="10" cellspacing="0" style="background-color: #2b2b2b; color: #a9b7c6; border-radius: 5px; margin-top: 10px; margin-bottom: 10px;">
-                    <tr>
-                        <td>
-                            <pre style="font-family: Consolas, monospace; margin: 0;">{content}</pre>
-                        </td>
-                    </tr>
-                </table>
-                """
-                formatted_parts.append(code_html)
-            else:
-                # Normal Text
-                part = html.escape(part)
-                part = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', part)
-                part = part.replace('\n', '<br>')
-                formatted_parts.append(part)
-                
-        return "".join(formatted_parts)
+        if role.startswith("User"):
+            color = "#00ff9d" # Greenish cyan
+            bg = "rgba(0, 255, 157, 20)"
+        else:
+            color = "#00e5ff" # Cyan
+            bg = "rgba(0, 229, 255, 20)"
+        if streaming:
+            formatted_msg = html.escape(message).replace('\n', '<br>')
+        else:
+            formatted_msg = self.process_markdown(message)
+
+        return f"""
+         <div style="margin-bottom: 15px;">
+            <div style="color: {color}; font-weight: bold; font-size: 10pt; margin-bottom: 2px;">{role}</div>
+            <div style="background-color: {bg}; padding: 8px; border-radius: 10px; color: white;">{formatted_msg}</div>
+         </div>
+         """
 
     def append_message(self, role, message):
+         self.flush_tokens() # Keep order with a message still streaming
          if role == "User":
              # Save for editing
              self.last_user_text = message
              
-             color = "#00ff9d" # Greenish cyan
-             bg = "rgba(0, 255, 157, 20)"
-             formatted_msg = self.process_markdown(message)
-             
              # CLEAR Live page when user speaks new thing
              self.page_live.clear()
+             self.live_frame = None # Went with it; a stream still running keeps to the history
              
              # Also ensure we switch back to live view if automatic behavior is desired
              # self.stacked_layout.setCurrentIndex(0) 
-         else:
-             color = "#00e5ff" # Cyan
-             bg = "rgba(0, 229, 255, 20)"
-             formatted_msg = self.process_markdown(message)
-         
-         html_content = f"""
-         <div style="margin-bottom: 15px;">
-            <div style="color: {color}; font-weight: bold; font-size: 10pt; margin-bottom: 2px;">{role}</div>
-            <div style="background-color: {bg}; padding: 8px; border-radius: 10px; color: white;">{formatted_msg}</div>
-         </div>
-         """
          
          # Append to BOTH views
-         self.page_live.append(html_content)
-         self.page_history.append(html_content)
+         self.page_live.append(self._message_html(role, message))
+         self.last_rows[role] = self.history_model.append(role, message)
+         if role == "User":
+             self.live_user_end = self.page_live.document().characterCount() - 1
          
-         # Scroll both
          sb_live = self.page_live.verticalScrollBar()
          sb_live.setValue(sb_live.maximum())
-         
-         sb_hist = self.page_history.verticalScrollBar()
-         sb_hist.setValue(sb_hist.maximum())
+
+    def revise_message(self, role, message):
+        """Replaces the latest message from `role` in both views (a question transcribed again)."""
+        row = self.last_rows.get(role)
+        if row is None:
+            return
+        self.history_model.set_text(row, message)
+        if role != "User" or self.live_user_end is None:
+            return
+        self.last_user_text = message
+
+        # The user bubble starts the live page; an answer may already stream below it
+        cursor = QTextCursor(self.page_live.document())
+        cursor.setPosition(self.live_user_end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertHtml(self._message_html(role, message))
+        shift = cursor.position() - self.live_user_end
+        self.live_user_end = cursor.position()
+        if getattr(self, 'live_frame', None) is not None:
+            self.live_tail_pos += shift
 
     # --- Streaming Support ---
     def start_streaming_message(self, role):
         """Prepares the UI for a new incoming streamed message."""
+        self.flush_tokens()
         if role == "User":
              color = "#00ff9d" 
-             bg = "rgba(0, 255, 157, 20)"
+             bg = (0, 255, 157, 20)
              self.page_live.clear() 
+             self.live_user_end = None
         else:
              color = "#00e5ff"
-             bg = "rgba(0, 229, 255, 20)"
+             bg = (0, 229, 255, 20)
 
         self.current_stream_role = role
         self.current_stream_content = ""
         
-        # 1. Capture Start Positions for final replacement
-        # We need to know where this message started to replace it with the formatted block later.
-        self.live_start_pos = self.page_live.document().characterCount() - 1
-        self.hist_start_pos = self.page_history.document().characterCount() - 1
+        # 1. The history row is re-rendered from the raw text as it grows
+        self.hist_row = self.history_model.append(role, "", streaming=True)
         
         # 2. Append Header (Visual only for now)
         header_html = f'<div style="color: {color}; font-weight: bold; margin-top: 10px;">{role}</div>'
         self.page_live.append(header_html)
-        self.page_history.append(header_html)
         
         # 3. Force "Normal White" style for the subsequent streaming text
         # If we don't do this, it might inherit the Bold/Color of the header
-        from PyQt6.QtGui import QTextCharFormat, QColor, QFont
-        import hashlib
+        from PyQt6.QtGui import QTextCharFormat, QTextFrameFormat, QColor, QFont
         
         fmt = QTextCharFormat()
         fmt.setForeground(QColor("white"))
@@ -512,7 +574,19 @@ class TransparentOverlay(QMainWindow):
         fmt.setFontPointSize(10) # Match normal size
         
         self.page_live.setCurrentCharFormat(fmt)
-        self.page_history.setCurrentCharFormat(fmt)
+        self.stream_fmt = fmt
+
+        # 4. The message streams into a bubble frame. Markdown blocks are formatted in
+        # place as they close; only the open tail (live_tail_pos to the end) is plain text.
+        frame_fmt = QTextFrameFormat()
+        frame_fmt.setBackground(QColor(*bg))
+        frame_fmt.setPadding(8)
+        frame_fmt.setBottomMargin(15)
+        cursor = self.page_live.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        self.live_frame = cursor.insertFrame(frame_fmt)
+        self.live_tail_pos = self.live_frame.firstPosition()
+        self.markdown = StreamingMarkdown()
 
     def stream_token(self, token):
         """Appends a token to the current message."""
@@ -520,19 +594,59 @@ class TransparentOverlay(QMainWindow):
             self.current_stream_content = ""
             
         self.current_stream_content += token
-        
+        self.pending_tokens.append(token)
+
+        if not self.flush_timer.isActive():
+            # First token after a quiet spell: draw it now, then at most once per frame
+            self.flush_tokens()
+            self.flush_timer.start()
+
+    def _on_flush_timer(self):
+        if self.pending_tokens:
+            self.flush_tokens()
+        else:
+            self.flush_timer.stop() # Stream ended or stalled; the next token restarts it
+
+    def flush_tokens(self):
+        """Draws all buffered tokens: one insertion and one scroll per view."""
+        if not self.pending_tokens:
+            return
+        text = "".join(self.pending_tokens)
+        self.pending_tokens.clear()
+        self._insert_stream_text(text)
+        self.tokens_rendered.emit()
+
+    def _insert_stream_text(self, text):
         # Update Live View (Fast)
-        self.page_live.moveCursor(QTextCursor.MoveOperation.End)
-        self.page_live.insertPlainText(token)
-        self.page_live.verticalScrollBar().setValue(self.page_live.verticalScrollBar().maximum())
+        if getattr(self, 'live_frame', None) is not None:
+            blocks = self.markdown.feed(text)
+            if blocks and not all(is_plain(block) for block in blocks):
+                self._write_live_blocks(blocks, self.markdown.tail())
+            else:
+                # Closed plain lines already look right: append only, the tail just moves on
+                cursor = self.live_frame.lastCursorPosition()
+                cursor.insertText(text, self.stream_fmt)
+                if blocks:
+                    self.live_tail_pos = cursor.position() - len(self.markdown.tail())
+            self.page_live.verticalScrollBar().setValue(self.page_live.verticalScrollBar().maximum())
         
         # Update History View
-        self.page_history.moveCursor(QTextCursor.MoveOperation.End)
-        self.page_history.insertPlainText(token)
-        self.page_history.verticalScrollBar().setValue(self.page_history.verticalScrollBar().maximum())
+        self.history_model.append_text(self.hist_row, text)
+
+    def _write_live_blocks(self, blocks, tail=""):
+        # Swap the plain tail for the blocks it closed, then put back what is still open
+        cursor = self.live_frame.lastCursorPosition()
+        cursor.setPosition(self.live_tail_pos, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+        for block in blocks:
+            cursor.insertHtml(block_html(block))
+        self.live_tail_pos = cursor.position()
+        cursor.insertText(tail, self.stream_fmt)
 
     def end_streaming_message(self):
-        """Finalize the message by replacing raw text with formatted HTML (Bubbles + Code)."""
+        """Finalize the message: format the last open Markdown block and mark the history row done."""
+        self.flush_tokens()
+        self.flush_timer.stop()
         full_text = getattr(self, 'current_stream_content', "")
         role = getattr(self, 'current_stream_role', "Assistant")
         
@@ -542,51 +656,14 @@ class TransparentOverlay(QMainWindow):
         else:
             self.last_assistant_text = full_text
 
-        if not full_text:
-            return
+        if hasattr(self, 'hist_row'):
+            self.history_model.set_text(self.hist_row, full_text, streaming=False)
 
-        # Helper to replace range with formatted message
-        def replace_range(text_edit, start_pos, new_html):
-            cursor = text_edit.textCursor()
-            cursor.setPosition(start_pos)
-            cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
-            cursor.removeSelectedText()
-            # Now append the nice formatted message
-            # But wait, append() adds to end. insertHtml inserts at cursor.
-            # Using insertHtml might be inline. 
-            # We want to use append_message logic but putting it HERE.
-            # actually append_message calculates the HTML.
-            
-            # Let's manually generate HTML and insert it.
-            # We use the LOGIC from append_message but we insert it.
-            
-            if role == "User":
-                 color = "#00ff9d" 
-                 bg = "rgba(0, 255, 157, 20)"
-            else:
-                 color = "#00e5ff"
-                 bg = "rgba(0, 229, 255, 20)"
-                 
-            formatted_msg = self.process_markdown(full_text)
-            
-            html_content = f"""
-             <div style="margin-bottom: 15px;">
-                <div style="color: {color}; font-weight: bold; font-size: 10pt; margin-bottom: 2px;">{role}</div>
-                <div style="background-color: {bg}; padding: 8px; border-radius: 10px; color: white;">{formatted_msg}</div>
-             </div>
-             """
-            
-            cursor.insertHtml(html_content)
-            
-            # Scroll to bottom
-            sb = text_edit.verticalScrollBar()
-            sb.setValue(sb.maximum())
-
-        # Apply to both
-        if hasattr(self, 'live_start_pos'):
-            replace_range(self.page_live, self.live_start_pos, full_text)
-        if hasattr(self, 'hist_start_pos'):
-            replace_range(self.page_history, self.hist_start_pos, full_text)
+        # Only the block still open gets formatted now; the rest already is
+        if getattr(self, 'live_frame', None) is not None:
+            self._write_live_blocks(self.markdown.finish())
+            self.page_live.verticalScrollBar().setValue(self.page_live.verticalScrollBar().maximum())
+            self.live_frame = None
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
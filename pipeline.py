@@ -0,0 +1,654 @@
+"""Qt-free core of the assistant: capture -> VAD -> STT (Listener) -> LLM (Thinker).
+
+The overlay (main.py) subclasses Listener and Thinker as QObjects and
+re-emits every event as the Qt signal of the same name. Without a display,
+Pipeline wires the two together on plain threads, and running this module
+streams transcripts, tokens and timings as JSON lines on stdout:
+
+    python -m pipeline --audio recordings/ --fast
+    python -m pipeline --no-llm          # live input device, transcripts only
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from latency import tracer, startup
+from audio_buffer import AudioRingBuffer
+from vad import create_vad
+from coalescer import QuestionCoalescer, normalize_question
+
+class EventSource:
+    """Plain-Python stand-in for Qt signals.
+
+    publish(event, *args) calls every subscriber with (event, *args) on the
+    publishing thread, so subscribers must be quick and thread-safe.
+    """
+
+    def __init__(self):
+        super().__init__() # QObject, in the Qt subclasses
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, event, *args):
+        for callback in self.subscribers:
+            callback(event, *args)
+
+
+# --- LLM (Thinker) ---
+class Thinker(EventSource):
+    """Answers questions one at a time on the thread that calls run().
+
+    Events: generation_started(uid), token_ready(token), response_ready(status)
+    with status "ok" or "cancelled" (preempted or stopped), status_update(text).
+    """
+
+    def __init__(self, model_path=r"local_models\qwen2.5-coder-3b-instruct-q4_k_m.gguf", policy="preempt", speculate="off",
+                 llm_options=None, conversation_path=None, resume=False):
+        super().__init__()
+        self.queue = queue.Queue()
+        self.running = True
+        self.llm = None
+        self.model_path = model_path
+        self.llm_options = llm_options or {} # Extra LLM() arguments, e.g. use_mlock=True
+        # "preempt": a newer question cancels the running answer and skips older queued ones
+        # "queue":   answer every question in order
+        self.policy = policy
+        self.busy = False
+        # De-duplicates and merges questions before they reach the queue
+        self.coalescer = QuestionCoalescer()
+        # Work on stable partial transcripts while the speaker is still talking:
+        # "off", "prefill" (evaluate the prompt early) or "answer" (also answer speculatively)
+        self.speculate = speculate
+        self.partial = None        # Latest (text, uid) from add_partial()
+        self.answered_uid = None   # Partials of this utterance are stale
+        # Set by add_question(), add_partial() and stop(); the idle worker sleeps on it
+        self.wakeup = threading.Event()
+        # History and KV state are saved here on exit; resume=True picks them up again at start
+        self.conversation_path = conversation_path
+        self.resume = resume
+        
+    def _preempted(self):
+        # Polled by the LLM once per generated token; stop() cancels too, so exit is not held up
+        return not self.running or (self.policy == "preempt" and not self.queue.empty())
+
+    def _take_newest(self, item):
+        # Drop questions that a newer one has already superseded. Queue items
+        # are (text, uid, merged, force), see add_question()
+        while True:
+            try:
+                newer = self.queue.get_nowait()
+            except queue.Empty:
+                return item
+            merged = newer[2]
+            print(f"[LLM] Skipping superseded question: {item[0]}")
+            tracer.finish(item[1], status="merged" if merged else "superseded")
+            self.coalescer.count_skipped(merged)
+            self.queue.task_done()
+            item = newer
+        
+    def _speculate_partial(self):
+        # Called while idle; returns True if there was a partial to work on
+        partial, self.partial = self.partial, None
+        if partial is None:
+            return False
+        text, uid = partial
+        if uid == self.answered_uid:
+            return False
+
+        # Give up as soon as the final question or a newer partial arrives
+        should_stop = lambda: not self.queue.empty() or self.partial is not None
+        t0 = time.perf_counter()
+        if self.speculate == "answer":
+            done = self.llm.speculate(text, should_stop=should_stop)
+        else:
+            done = self.llm.prefill(text, should_stop=should_stop)
+        if done:
+            tracer.add(uid, "speculation_ms", round((time.perf_counter() - t0) * 1000.0, 2))
+        return True
+
+    def run(self):
+        try:
+            # Initialize LLM
+            self.publish("status_update", "Loading LLM...")
+            # Heavy backends are imported here, on the worker thread, so the
+            # overlay is up first and Whisper and the LLM load concurrently
+            with startup.span("llm_import"):
+                from llm import LLM
+            # Point to the local folder where we are downloading the model
+            with startup.span("llm_load"):
+                self.llm = LLM(self.model_path, **self.llm_options)
+            # A cold first question would be much slower than the rest
+            self.publish("status_update", "Warming up LLM...")
+            with startup.span("llm_warmup"):
+                self.llm.warmup()
+            if self.resume and self.conversation_path and os.path.exists(self.conversation_path):
+                # After warm-up, so the restored KV state is the one the next question reuses
+                with startup.span("llm_resume"):
+                    self._resume_conversation()
+            self.publish("status_update", "LLM Ready")
+            startup.mark("llm_ready")
+        except Exception as e:
+            self.publish("status_update", f"LLM Error: {str(e)}")
+            return
+
+        idle_work = True # Summarizing is due once the queue runs dry
+        while self.running:
+            item = uid = None
+            # Cleared before looking for work, so a wakeup arriving meanwhile is not lost
+            self.wakeup.clear()
+            try:
+                item = self.queue.get_nowait()
+                self.busy = True
+                if self.policy == "preempt":
+                    item = self._take_newest(item)
+                user_text, uid, _, force = item
+                self.answered_uid = uid
+                tracer.mark(uid, "llm_start")
+                
+                # Process Question
+                self.publish("generation_started", uid)
+                self.publish("status_update", "Thinking...")
+                
+                # Define callback to emit tokens
+                def stream_callback(token):
+                    tracer.mark(uid, "first_token")
+                    self.publish("token_ready", token)
+
+                status = ["ok"] # Cache hits report no stats
+                def stats_callback(stats):
+                    tracer.set(uid, "llm", stats.to_dict())
+                    if stats.cancelled:
+                        status[0] = "cancelled"
+
+                # Generate with streaming
+                response = self.llm.generate_response(
+                    user_text,
+                    stream_callback=stream_callback,
+                    stats_callback=stats_callback,
+                    should_stop=self._preempted,
+                    use_cache=not force # A typed correction must not get the stale answer back
+                )
+                tracer.mark(uid, "last_token")
+                
+                # Signal completion; a cancelled answer is not in the LLM history, so not worth keeping
+                self.publish("response_ready", status[0])
+                self.publish("status_update", "Listening...")
+                self.publish("status_update", "Listening...")
+                
+                self.busy = False
+                self.queue.task_done()
+                idle_work = True
+                
+            except queue.Empty:
+                if self.speculate != "off" and self._speculate_partial():
+                    continue
+                if idle_work:
+                    # Idle: compress old turns now, not while someone is waiting
+                    idle_work = False
+                    self.llm.maybe_summarize(should_stop=lambda: not self.queue.empty())
+                    continue
+                # Nothing to do: sleep until add_question(), add_partial() or stop()
+                self.wakeup.wait()
+                continue
+            except Exception as e:
+                print(f"LLM Processing Error: {e}")
+                self.publish("status_update", "Error generating response")
+                tracer.finish(uid, status="error")
+                self.busy = False
+                if item is not None:
+                    self.queue.task_done() # Or queue.join() would wait for it forever
+
+        if self.conversation_path:
+            self._save_conversation()
+        if self.llm.answer_cache is not None:
+            # The writer is a daemon thread: without this the newest answers never reach disk
+            self.llm.answer_cache.print_summary()
+            self.llm.answer_cache.close()
+
+    def _resume_conversation(self):
+        try:
+            self.llm.load_conversation(self.conversation_path)
+            self.publish("status_update", f"Resumed conversation ({len(self.llm.history.turns)} turns)")
+        except Exception as e:
+            print(f"[LLM] Could not resume conversation: {e}")
+
+    def _save_conversation(self):
+        # An empty session must not overwrite the conversation saved by the previous one
+        if not (self.llm.history.turns or self.llm.history.summary):
+            return
+        try:
+            start = time.perf_counter()
+            self.llm.save_conversation(self.conversation_path)
+            print(f"[LLM] Saved conversation to {self.conversation_path} in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"[LLM] Could not save conversation: {e}")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.llm is not None:
+            self.llm.session_stats.print_summary()
+        self.coalescer.print_summary()
+
+    def add_question(self, text, uid=None, force=False):
+        # force=True: always answer (typed corrections), skip de-duplication
+        if uid is None:
+            # Typed corrections have no audio stages
+            uid = tracer.new_utterance()
+            tracer.set(uid, "source", "correction")
+
+        admitted = self.coalescer.admit(text, force=force)
+        if admitted is None:
+            tracer.finish(uid, status="duplicate")
+            return
+        text, merged = admitted
+
+        tracer.mark(uid, "llm_enqueue")
+        tracer.set(uid, "text", text)
+        self.queue.put((text, uid, merged, force))
+        self.wakeup.set()
+
+    def add_partial(self, text, uid):
+        # Stable (committed) partial transcript; only the newest one is kept
+        if self.speculate != "off" and text:
+            self.partial = (text, uid)
+            self.wakeup.set()
+
+
+# --- Audio (Listener) ---
+class Listener(EventSource):
+    """Capture -> VAD -> streaming STT on the thread that calls run().
+
+    Events: text_ready(role, text), text_revised(role, text) when the final
+    transcript of a question sent early differs from its preview,
+    utterance_ready(text, uid) for the Thinker, partial_ready(text, uid) with
+    stable partials (speculative prefill), status_update(text).
+    """
+    HANGOVER_MS = 1000            # Silence that ends an utterance
+    LOW_LATENCY_HANGOVER_MS = 500
+
+    def __init__(self, vad_backend="energy", audio_source=None, gain=5.0, low_latency=False,
+                 preview_seconds=1.25, preroll_seconds=1.5, pause_ms=200, hangover_ms=None):
+        super().__init__()
+        self.running = True
+        # Low latency: record in 20 ms blocks so VAD decisions (the pause check,
+        # end of speech) are made within 20 ms of the frame that settles them
+        # instead of up to 256 ms later; STT still runs on aggregates. End of
+        # speech still waits out the hangover, which is shorter in this mode.
+        self.low_latency = low_latency
+        self.hangover_ms = hangover_ms or (self.LOW_LATENCY_HANGOVER_MS if low_latency else self.HANGOVER_MS)
+        self.preview_seconds = preview_seconds # Audio between two preview decodes
+        self.preroll_seconds = preroll_seconds # Kept before the VAD onset
+        self.pause_ms = pause_ms               # A pause this long triggers an extra preview ("?" check)
+        self.vad_backend = vad_backend # "energy", "silero" or a ready VAD object
+        self.gain = gain # Digital gain; None if the source already applied it
+        self.audio_source = audio_source # e.g. FileAudioCapture; None = live device
+        self.last_voice_time = None # perf_counter() of the last block with speech in it
+        self.utterance_id = None    # Latency trace ID of the current utterance
+    
+    def run(self):
+        try:
+            if self.audio_source is not None:
+                self.audio_capture = self.audio_source
+            else:
+                # Imported lazily: soundcard needs a live audio server
+                from audio_capture import AudioCapture
+                block_size = AudioCapture.LOW_LATENCY_BLOCK_SIZE if self.low_latency else 4096
+                self.audio_capture = AudioCapture(block_size=block_size)
+            self.publish("status_update", "Loading Whisper...")
+            with startup.span("stt_import"):
+                from stt import SpeechToText, StreamingTranscriber
+            # Previews run on a small greedy model, final transcripts on the accurate one
+            with startup.span("whisper_load"):
+                self.stt = SpeechToText(model_size="small", preview_model_size="base")
+            self.publish("status_update", "Warming up Whisper...")
+            with startup.span("whisper_warmup"):
+                self.stt.warmup()
+            sample_rate = self.audio_capture.sample_rate
+            # Utterance audio (pre-roll + speech) lives in one preallocated ring
+            self.audio_buffer = AudioRingBuffer(sample_rate * 30)
+            self.stream = StreamingTranscriber(self.stt, sample_rate=sample_rate, buffer=self.audio_buffer)
+            # Tracks min speech duration and hangover (end-of-speech) per frame
+            if isinstance(self.vad_backend, str):
+                self.vad = create_vad(self.vad_backend, sample_rate=sample_rate, hangover_ms=self.hangover_ms)
+            else:
+                self.vad = self.vad_backend
+            self.publish("status_update", "Listening...")
+            startup.mark("listening")
+        except Exception as e:
+            self.publish("status_update", f"Audio Error: {str(e)}")
+            return
+
+        self.audio_capture.start()
+
+        # Counted in samples, not blocks, so any block size behaves the same
+        preroll_samples = int(self.preroll_seconds * sample_rate)
+        preview_samples = int(self.preview_seconds * sample_rate)
+        pause_samples = int(self.pause_ms * sample_rate / 1000)
+        is_speaking = False
+        answered = False   # The "?" trigger closed the utterance; ignore the rest of this VAD segment
+        since_preview = 0  # Samples since the last preview decode
+        silence = 0        # Samples since the last voiced block
+        last_partial = ""
+        # CPU cost of this thread: the per-block work and the STT decodes separately
+        self.audio_seconds = 0.0
+        self.loop_cpu = 0.0
+        self.stt_cpu = 0.0
+        
+        # Audio processing loop
+        while self.running:
+            # Blocks until the source has audio; None once it has been stopped or ran out
+            chunk = self.audio_capture.get_audio_chunk()
+            if chunk is None:
+                if self.running and is_speaking:
+                    # The source ended mid-utterance (a replayed file): transcribe what was said
+                    tracer.mark(self.utterance_id, "speech_end", self.last_voice_time)
+                    tracer.mark(self.utterance_id, "vad_end")
+                    self.process_buffer()
+                error = getattr(self.audio_capture, "error", None)
+                if self.running and error:
+                    self.publish("status_update", f"Audio Error: {error}")
+                break
+            # When the block was recorded, so time spent queued counts towards latency
+            block_time = getattr(self.audio_capture, "block_time", None) or time.perf_counter()
+            cpu_start = time.thread_time()
+            self.audio_seconds += len(chunk) / sample_rate
+            
+            # Digital Gain, applied in place while copying into the ring
+            self.audio_buffer.write(chunk, gain=self.gain)
+            if self.vad.process(self.audio_buffer.view(len(chunk))) == "end":
+                answered = False
+            if self.vad.frame_flags.any():
+                self.last_voice_time = block_time
+                paused = False
+                silence = 0
+            else:
+                # Fires once, when a pause reaches pause_ms
+                paused = silence < pause_samples <= silence + len(chunk)
+                silence += len(chunk)
+            
+            if self.vad.triggered and not answered:
+                is_speaking = True
+                if self.utterance_id is None:
+                    self.utterance_id = tracer.new_utterance()
+                    tracer.mark(self.utterance_id, "capture", block_time)
+                
+                # Live Preview & Question Detection Logic
+                since_preview += len(chunk)
+                # Periodic, and as soon as the speaker pauses (a question usually ends in one)
+                if since_preview >= preview_samples or (paused and since_preview >= pause_samples):
+                    since_preview = 0
+                    stt_start = time.thread_time()
+                    try:
+                        # Only the uncommitted tail is decoded (see StreamingTranscriber)
+                        t0 = time.perf_counter()
+                        committed_text, _ = self.stream.process_iter()
+                        partial_text = self.stream.text()
+                        tracer.add(self.utterance_id, "stt_preview_ms", round((time.perf_counter() - t0) * 1000.0, 2))
+
+                        # Committed words will not change any more: safe to prefill on
+                        if committed_text and committed_text != last_partial:
+                            last_partial = committed_text
+                            self.publish("partial_ready", committed_text, self.utterance_id)
+                        
+                        if partial_text:
+                            # 1. Update UI Preview
+                            display_text = (partial_text[-40:] + '..') if len(partial_text) > 40 else partial_text
+                            self.publish("status_update", f"👂 {display_text}")
+                            
+                            # 2. Check for Question Mark (Trigger)
+                            # "Barge-in" - if we detect a full question, fire it off immediately!
+                            if "?" in partial_text[-5:]: # Ends with ? (or close to end)
+                                print(f"[Audio] Question Detected: {partial_text}")
+                                uid = self.utterance_id
+                                tracer.mark(uid, "speech_end", self.last_voice_time)
+                                # End of speech is decided here, once the preview decode found the "?"
+                                tracer.mark(uid, "vad_end")
+                                # This trigger exists to be fast: the preview text goes to the LLM
+                                # now, not after a final-tier decode of the whole question
+                                tracer.mark(uid, "stt_final")
+                                tracer.set(uid, "trigger", "question_mark")
+                                self.utterance_id = None
+                                # Send to Main Thread -> LLM
+                                self.publish("text_ready", "User", partial_text)
+                                self.publish("utterance_ready", partial_text, uid)
+                                # Then the final tier transcribes the question (and clears the
+                                # buffer to start listening for the NEXT sentence)
+                                self.revise(partial_text, self.stream.finish())
+                                
+                                last_partial = ""
+                                is_speaking = False # Reset state
+                                # The VAD stays triggered through its hangover; reopening on
+                                # those blocks would decode trailing silence as a new question
+                                answered = True
+                                self.publish("status_update", "Listening for next...")
+                                
+                    except Exception:
+                        pass
+                    self.stt_cpu += time.thread_time() - stt_start
+                        
+            else:
+                if is_speaking:
+                    # VAD hangover elapsed: end of speech
+                    tracer.mark(self.utterance_id, "speech_end", self.last_voice_time)
+                    tracer.mark(self.utterance_id, "vad_end", block_time)
+                    # Process full phrase if not already caught by ? trigger
+                    stt_start = time.thread_time()
+                    self.process_buffer()
+                    self.stt_cpu += time.thread_time() - stt_start
+                    
+                    is_speaking = False
+                    since_preview = 0
+                    last_partial = ""
+                    self.publish("status_update", "Listening...")
+                else:
+                    # Keep only the pre-roll while idle
+                    self.audio_buffer.keep_last(preroll_samples)
+            self.loop_cpu += time.thread_time() - cpu_start
+
+    def revise(self, preview, final):
+        """Publishes the final transcript of a question already sent as its preview, if the words changed.
+
+        The overlay replaces the preview with it (text_revised). It also goes
+        to the Thinker as a question of its own: the coalescer drops it if it
+        is a near-duplicate, otherwise it preempts the answer to the preview.
+        """
+        if not final or normalize_question(final) == normalize_question(preview):
+            return
+        print(f"[Audio] Final transcript differs from preview: {final}")
+        uid = tracer.new_utterance()
+        tracer.set(uid, "trigger", "revision")
+        self.publish("text_revised", "User", final)
+        self.publish("utterance_ready", final, uid)
+
+    def print_cpu_usage(self):
+        if getattr(self, "audio_seconds", 0) <= 0:
+            return
+        block_cpu = self.loop_cpu - self.stt_cpu
+        print(f"[Audio] CPU per second of audio: {block_cpu / self.audio_seconds * 1000:.2f} ms capture/VAD loop, "
+              f"{self.stt_cpu / self.audio_seconds * 1000:.1f} ms STT")
+
+    def process_buffer(self):
+        uid = self.utterance_id
+        self.utterance_id = None
+        try:
+            # Reuses the words committed during previews, decodes only the tail
+            text = self.stream.finish()
+            tracer.mark(uid, "stt_final")
+            if text and len(text.strip()) > 1:
+                print(f"[Audio] Final Phrase: {text}")
+                tracer.set(uid, "trigger", "silence")
+                self.publish("text_ready", "User", text)
+                self.publish("utterance_ready", text, uid)
+            else:
+                tracer.finish(uid, status="empty")
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            self.stream.reset()
+            tracer.finish(uid, status="error")
+
+    def stop(self):
+        self.running = False
+        if hasattr(self, 'audio_capture'):
+            self.audio_capture.stop()
+        self.print_cpu_usage()
+
+
+class Pipeline(EventSource):
+    """Listener -> Thinker without Qt, each on its own thread.
+
+    Republishes the events of both, plus timings(entry): the finished latency
+    trace of every utterance (see LatencyTracer.finish).
+    """
+
+    def __init__(self, listener, thinker=None):
+        super().__init__()
+        self.listener = listener
+        self.thinker = thinker # None: transcribe only
+        self.current_uid = None # Utterance being answered
+        self.llm_ready = threading.Event()
+        self.llm_failed = False # The Thinker could not load its model and answers nothing
+        self.threads = []
+        listener.subscribe(self._on_listener_event)
+        if thinker is not None:
+            thinker.subscribe(self._on_thinker_event)
+
+    def _on_listener_event(self, event, *args):
+        self.publish(event, *args)
+        if event == "utterance_ready":
+            text, uid = args
+            if self.thinker is None:
+                self._finish(uid, "transcribed")
+            elif len(text) > 2: # Same filter as the overlay
+                self.thinker.add_question(text, uid)
+            else:
+                self._finish(uid, "filtered")
+        elif event == "partial_ready" and self.thinker is not None:
+            self.thinker.add_partial(*args)
+
+    def _on_thinker_event(self, event, *args):
+        if event == "generation_started":
+            self.current_uid = args[0]
+        elif event == "status_update" and (args[0] == "LLM Ready" or args[0].startswith("LLM Error")):
+            self.llm_failed = args[0].startswith("LLM Error")
+            self.llm_ready.set()
+        self.publish(event, *args)
+        if event == "response_ready":
+            uid, self.current_uid = self.current_uid, None
+            self._finish(uid, args[0])
+
+    def _finish(self, uid, status):
+        entry = tracer.finish(uid, status=status)
+        if entry is not None:
+            self.publish("timings", entry)
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return thread
+
+    def start(self):
+        if self.thinker is not None:
+            self._start_thread(self.thinker.run, "thinker")
+            # Load the LLM first so the first answer is not stuck behind model loading
+            self.llm_ready.wait()
+        self.listener_thread = self._start_thread(self.listener.run, "listener")
+
+    def drain(self):
+        """Waits until the audio source has ended and every question from it is answered.
+
+        Listener.run returns once the source runs out (after transcribing the
+        utterance still open), having handed all its questions to the Thinker.
+        Only returns for a source that ends, such as a replayed file.
+        """
+        self.listener_thread.join()
+        if self.thinker is not None and not self.llm_failed:
+            self.thinker.queue.join() # Includes the answer being generated
+
+    def stop(self):
+        self.listener.stop()
+        if self.thinker is not None:
+            self.thinker.stop()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+# JSONL record for each event: record name and argument names
+JSONL_EVENTS = {
+    "status_update": ("status", ("text",)),
+    "partial_ready": ("partial", ("text", "uid")),
+    "utterance_ready": ("transcript", ("text", "uid")),
+    "generation_started": ("answer_start", ("uid",)),
+    "token_ready": ("token", ("text",)),
+    "response_ready": ("answer_end", ("status",)),
+}
+
+def jsonl_writer(out):
+    """Pipeline subscriber that writes one JSON object per event to `out`."""
+    t0 = time.perf_counter()
+    lock = threading.Lock() # Events arrive from the listener and thinker threads
+
+    def on_event(event, *args):
+        if event == "timings":
+            record = {"event": "timings", **args[0]}
+        elif event in JSONL_EVENTS:
+            name, fields = JSONL_EVENTS[event]
+            record = {"event": name, **dict(zip(fields, args))}
+        else:
+            return # text_ready repeats the transcript
+        record["t"] = round(time.perf_counter() - t0, 3)
+        line = json.dumps(record, ensure_ascii=False)
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+    return on_event
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the assistant headless and stream JSONL events to stdout.")
+    parser.add_argument("--audio", default=None, help="WAV/FLAC file or folder to replay instead of the input device")
+    parser.add_argument("--fast", action="store_true", help="Replay as fast as possible instead of real time")
+    parser.add_argument("--model", default=None, help="GGUF or Hugging Face model path (default: the overlay's)")
+    parser.add_argument("--no-llm", action="store_true", help="Transcribe only")
+    parser.add_argument("--vad", default="energy", choices=["energy", "silero"])
+    parser.add_argument("--low-latency", action="store_true", help="20 ms capture blocks, 500 ms end-of-speech hangover")
+    parser.add_argument("--policy", default="preempt", choices=["preempt", "queue"], help="Thinker policy for overlapping questions")
+    parser.add_argument("--speculate", default="off", choices=["off", "prefill", "answer"], help="Work on stable partial transcripts before the speaker stops")
+    parser.add_argument("--conversation", default=None, help="Save the conversation (history and KV state) here on exit")
+    parser.add_argument("--resume", action="store_true", help="Continue the conversation saved at --conversation")
+    args = parser.parse_args()
+
+    # stdout carries the JSONL stream only; the [Tag] logging goes to stderr
+    out, sys.stdout = sys.stdout, sys.stderr
+
+    source = None
+    if args.audio:
+        from file_capture import FileAudioCapture
+        source = FileAudioCapture(args.audio, realtime=not args.fast, block_size=320 if args.low_latency else 4096)
+    listener = Listener(vad_backend=args.vad, audio_source=source, low_latency=args.low_latency)
+    thinker = None
+    if not args.no_llm:
+        options = {"model_path": args.model} if args.model else {}
+        thinker = Thinker(policy=args.policy, speculate=args.speculate, conversation_path=args.conversation,
+                          resume=args.resume, **options)
+
+    pipeline = Pipeline(listener, thinker)
+    pipeline.subscribe(jsonl_writer(out))
+    pipeline.start()
+    try:
+        if source is not None:
+            pipeline.drain()
+        else:
+            threading.Event().wait() # Until Ctrl+C
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        tracer.close()
@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+import time
+
+from db_writer import BatchedWriter
+
+# Force Absolute Path for finding local resources
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_DIR = os.path.join(BASE_DIR, "history")
+
+class SessionStore:
+    """Every turn of every session in SQLite, with a full-text index.
+
+    add_turn() only queues the row; a writer thread commits whatever has
+    queued up in one transaction, so the UI thread never waits on disk.
+    search() reads through its own connection (WAL mode, so it does not
+    block on the writer) and returns the newest matches first, which FTS5
+    walks in rowid order and stops at the limit instead of ranking every
+    hit. If this SQLite build has no FTS5, search falls back to a LIKE scan.
+    """
+
+    def __init__(self, path=None, label=None):
+        self.path = path or os.path.join(HISTORY_DIR, "sessions.db")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.db = sqlite3.connect(self.path, check_same_thread=False) # Reads (UI thread)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                started REAL,
+                ended REAL,
+                label TEXT
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                id INTEGER PRIMARY KEY,
+                session_id INTEGER REFERENCES sessions(id),
+                role TEXT,
+                text TEXT,
+                created REAL,
+                timings TEXT
+            );
+            CREATE INDEX IF NOT EXISTS turns_session ON turns(session_id);
+        """)
+        try:
+            # External-content index: the text is stored once, in turns
+            self.db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(text, content='turns', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+                    INSERT INTO turns_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS turns_ad AFTER DELETE ON turns BEGIN
+                    INSERT INTO turns_fts(turns_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            print("[Sessions] SQLite has no FTS5; search will scan")
+            self.has_fts = False
+        cur = self.db.execute("INSERT INTO sessions (started, label) VALUES (?, ?)", (time.time(), label))
+        self.session_id = cur.lastrowid
+        self.db.commit()
+
+        self.writer = BatchedWriter(self.path, self._write, name="session-store", tag="Sessions")
+
+    def add_turn(self, role, text, timings=None):
+        """Queues one turn of the current session; timings is a dict (stored as JSON)."""
+        if not text:
+            return
+        self.writer.put((self.session_id, role, text, time.time(), json.dumps(timings) if timings else None))
+
+    def _write(self, db, rows):
+        db.executemany("INSERT INTO turns (session_id, role, text, created, timings) "
+                       "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _fts_query(self, query):
+        # Every word must match, as a prefix; quoting keeps FTS syntax out of user input
+        words = [w.replace('"', '""') for w in query.split()]
+        return " ".join(f'"{w}"*' for w in words)
+
+    def search(self, query, limit=100):
+        """Newest matches across all sessions: [(session_id, role, text, created)]."""
+        if not query.strip():
+            return []
+        if self.has_fts:
+            sql = ("SELECT t.session_id, t.role, t.text, t.created FROM "
+                   "(SELECT rowid FROM turns_fts WHERE turns_fts MATCH ? ORDER BY rowid DESC LIMIT ?) f "
+                   "JOIN turns t ON t.id = f.rowid ORDER BY t.id DESC")
+            args = (self._fts_query(query), limit)
+        else:
+            sql = ("SELECT session_id, role, text, created FROM turns "
+                   "WHERE text LIKE ? ORDER BY created DESC LIMIT ?")
+            args = (f"%{query.strip()}%", limit)
+        try:
+            return self.db.execute(sql, args).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"[Sessions] Search failed: {e}")
+            return []
+
+    def close(self):
+        """Writes what is still queued and closes the session."""
+        self.writer.close()
+        self.db.execute("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session_id))
+        self.db.commit()
+        self.db.close()
@@ -1,17 +1,72 @@
 import numpy as np
-import torch
+import ctranslate2
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper import WhisperModel
+from audio_buffer import AudioRingBuffer
+from vad import create_vad
+
+try:
+    from faster_whisper import BatchedInferencePipeline
+    HAS_BATCHED_PIPELINE = True
+except ImportError:
+    HAS_BATCHED_PIPELINE = False # faster-whisper < 1.1: fall back to a worker pool
+
+def split_at_pauses(audio, sample_rate=16000, max_seconds=25.0, vad=None):
+    """Cut a long buffer into spans of at most max_seconds. Returns [(start, end)] in samples.
+
+    Each cut goes in the middle of the longest VAD pause in the second half of
+    the window, or at the quietest frame if nobody paused.
+    """
+    if vad is None:
+        vad = create_vad("energy", sample_rate=sample_rate)
+    vad.reset()
+    vad.process(audio)
+    flags = vad.frame_flags
+    fs = vad.frame_size
+    energy = np.abs(audio[:len(flags) * fs]).reshape(-1, fs).mean(axis=1)
+    max_frames = max(2, int(max_seconds * sample_rate / fs))
+
+    spans = []
+    start = 0
+    while len(flags) - start > max_frames:
+        lo, hi = start + max_frames // 2, start + max_frames
+        best_len, cut = 0, None
+        run = 0
+        for i in range(lo, hi):
+            if flags[i]:
+                run = 0
+                continue
+            run += 1
+            if run > best_len:
+                best_len, cut = run, i - run // 2
+        if cut is None:
+            cut = lo + int(np.argmin(energy[lo:hi]))
+        spans.append((start * fs, cut * fs))
+        start = cut
+    spans.append((start * fs, len(audio)))
+    return spans
 
 class SpeechToText:
-    def __init__(self, model_size="small"):
-        # Map "tiny" to "small" if user passed tiny, or keep as is.
-        # Recommendation: Use "small" or "medium" for better accent recognition.
-        if model_size == "tiny" or model_size == "base":
-            model_size = "small" # Upgrade automatically for better quality
+    """faster-whisper with two tiers, each picked by the caller.
 
-        print(f"Loading Faster-Whisper model: {model_size}...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+    - "final":   model_size (small/medium recommended for accents), beam search
+    - "preview": preview_model_size (tiny/base), greedy decoding, int8
+
+    With preview_model_size=None both tiers use the final model and settings.
+
+    transcribe() of a buffer of batch_min_seconds or more goes through
+    transcribe_batched(). That is for whole recordings (bench_stt.py, file
+    transcription): the live path never gets there, since StreamingTranscriber
+    keeps at most max_buffer_seconds (15 s) and decodes with word timestamps.
+    """
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_size="small", preview_model_size=None, batch_size=8, workers=2, batch_min_seconds=30.0):
+        # faster-whisper runs on CTranslate2; no need to import torch just to find a GPU
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
         compute_type = "float16" if device == "cuda" else "int8"
         
         # Local model path
@@ -19,18 +74,273 @@ class SpeechToText:
         if not os.path.exists(local_path):
             os.makedirs(local_path)
             
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type, download_root=local_path)
-        print(f"Faster-Whisper model loaded on {device} ({compute_type})")
+        # Long buffers are split at pauses and decoded together (see transcribe_batched)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.batch_min_seconds = batch_min_seconds
+        # num_workers lets concurrent transcribe() calls from the fallback pool run in parallel
+        num_workers = 1 if HAS_BATCHED_PIPELINE else workers
+        two_tier = preview_model_size and preview_model_size != model_size
 
-    def transcribe(self, audio_data):
+        # Both tiers load at the same time (CTranslate2 releases the GIL while loading)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            final_future = pool.submit(self._load_model, model_size, device, compute_type, local_path, num_workers)
+            if two_tier:
+                preview_compute_type = "int8_float16" if device == "cuda" else "int8"
+                preview_future = pool.submit(self._load_model, preview_model_size, device, preview_compute_type, local_path, 1)
+            self.model = final_future.result()
+
+        self.batched = BatchedInferencePipeline(model=self.model) if HAS_BATCHED_PIPELINE else None
+        self.tiers = {"final": {"model": self.model, "beam_size": 5}}
+        if two_tier:
+            self.tiers["preview"] = {"model": preview_future.result(), "beam_size": 1}
+        else:
+            self.tiers["preview"] = self.tiers["final"]
+
+    @property
+    def has_preview_tier(self):
+        return self.tiers["preview"] is not self.tiers["final"]
+
+    def warmup(self, seconds=1.0):
+        """Decode silence on every tier so the first real utterance is not the slow one."""
+        start = time.perf_counter()
+        silence = np.zeros(int(seconds * self.SAMPLE_RATE), dtype=np.float32)
+        for tier in (["final", "preview"] if self.has_preview_tier else ["final"]):
+            # Same call as StreamingTranscriber, so word timestamp alignment is warm too
+            self.transcribe_words(silence, tier=tier)
+        elapsed = time.perf_counter() - start
+        print(f"Faster-Whisper warm-up done in {elapsed:.2f}s")
+        return elapsed
+
+    def _load_model(self, model_size, device, compute_type, local_path, num_workers):
+        print(f"Loading Faster-Whisper model: {model_size}...")
+        model = WhisperModel(model_size, device=device, compute_type=compute_type, download_root=local_path,
+                             num_workers=num_workers)
+        print(f"Faster-Whisper model {model_size} loaded on {device} ({compute_type})")
+        return model
+
+    def transcribe(self, audio_data, batched=None, tier="final"):
         # audio_data: numpy array of float32, mono
         
         # faster-whisper expects float32
         if audio_data.dtype != np.float32:
             audio_data = audio_data.astype(np.float32)
 
-        segments, info = self.model.transcribe(audio_data, beam_size=5, language="en")
+        # batched=None: decide by length; short buffers gain nothing from splitting
+        if batched is None:
+            batched = tier == "final" and len(audio_data) >= self.batch_min_seconds * self.SAMPLE_RATE
+        if batched:
+            return self.transcribe_batched(audio_data)
+
+        options = self.tiers[tier]
+        segments, info = options["model"].transcribe(audio_data, beam_size=options["beam_size"], language="en")
         
         # Combine all segments
         text = " ".join([segment.text for segment in segments]).strip()
         return text
+
+    def transcribe_batched(self, audio_data):
+        """Split at VAD pauses and decode the spans in parallel. Same output format as transcribe().
+
+        Meant for long recordings, not the live utterance path (see the class docstring).
+        """
+        if audio_data.dtype != np.float32:
+            audio_data = audio_data.astype(np.float32)
+        spans = split_at_pauses(audio_data, self.SAMPLE_RATE)
+
+        if self.batched is not None:
+            # Sample offsets, not seconds: the pipeline slices the audio array with them
+            clips = [{"start": int(s), "end": int(e)} for s, e in spans]
+            segments, info = self.batched.transcribe(
+                audio_data,
+                beam_size=5,
+                language="en",
+                vad_filter=False,
+                clip_timestamps=clips,
+                batch_size=self.batch_size
+            )
+            return " ".join([segment.text for segment in segments]).strip()
+
+        def run(span):
+            return self.transcribe(audio_data[span[0]:span[1]], batched=False)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            texts = list(pool.map(run, spans)) # map keeps span order
+        return " ".join(t for t in texts if t).strip()
+
+    def transcribe_words(self, audio_data, initial_prompt=None, tier="final"):
+        # Same as transcribe() but returns [(start, end, word), ...] with times
+        # relative to the start of audio_data. Used by StreamingTranscriber.
+        if audio_data.dtype != np.float32:
+            audio_data = audio_data.astype(np.float32)
+
+        options = self.tiers[tier]
+        segments, info = options["model"].transcribe(
+            audio_data,
+            beam_size=options["beam_size"],
+            language="en",
+            word_timestamps=True,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=False
+        )
+
+        words = []
+        for segment in segments:
+            for word in (segment.words or []):
+                words.append((word.start, word.end, word.word))
+        return words
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+class StreamingTranscriber:
+    """Incremental transcription of one utterance using local agreement.
+
+    Every pass only decodes the audio that is not committed yet. Words that two
+    consecutive passes agree on are committed and their audio is trimmed away,
+    so the cost of a preview stays bounded no matter how long someone talks.
+
+    The audio lives in an AudioRingBuffer. Callers can pass their own buffer
+    and write into it directly (AudioWorker does, to apply gain in place).
+
+    Previews use the STT's preview tier. With a separate preview model the
+    committed words are only for display: audio is decoded once more with the
+    final tier when it gets trimmed, and finish() returns the final-tier text.
+    """
+
+    def __init__(self, stt, sample_rate=16000, trim_seconds=6.0, max_buffer_seconds=15.0, buffer=None):
+        self.stt = stt
+        self.sample_rate = sample_rate
+        self.trim_seconds = trim_seconds             # Trim committed audio once the tail is this long
+        self.max_buffer_seconds = max_buffer_seconds # Force a segment cut beyond this
+        if buffer is None:
+            buffer = AudioRingBuffer(int(sample_rate * max_buffer_seconds * 2))
+        self.audio = buffer
+        self.two_tier = stt.has_preview_tier
+        self.reset()
+
+    def reset(self):
+        self.audio.clear()
+        self.committed = []        # [(start, end, word)] in absolute time
+        self.hypothesis = []       # Uncommitted words from the last pass
+        self.last_commit_time = 0.0
+        self.decoded_upto = self.audio.written # Buffer position of the last decode
+        self.final_texts = []      # Final-tier text of audio already trimmed away (two-tier only)
+
+    @property
+    def buffer_offset(self):
+        # Absolute time (s) of the oldest buffered sample
+        return self.audio.start_index / self.sample_rate
+
+    def insert_audio(self, chunk):
+        self.audio.write(chunk)
+
+    def buffer_seconds(self):
+        return len(self.audio) / self.sample_rate
+
+    def committed_text(self):
+        return "".join(w[2] for w in self.committed).strip()
+
+    def tentative_text(self):
+        return "".join(w[2] for w in self.hypothesis).strip()
+
+    def text(self):
+        return "".join(w[2] for w in self.committed + self.hypothesis).strip()
+
+    def _decode(self):
+        # Only the uncommitted tail is decoded; committed text is the prompt
+        prompt = self.committed_text()[-200:] or None
+        words = self.stt.transcribe_words(self.audio.view(), initial_prompt=prompt, tier="preview")
+        self.decoded_upto = self.audio.written
+
+        words = [(self.buffer_offset + s, self.buffer_offset + e, w) for s, e, w in words]
+        # Drop words that belong to audio we already committed
+        words = [w for w in words if w[0] > self.last_commit_time - 0.1]
+        return self._drop_repeated_prefix(words)
+
+    def _drop_repeated_prefix(self, words):
+        # Whisper tends to repeat the tail of the prompt at the start of the
+        # next window. Remove up to 5 words that duplicate the committed tail.
+        if not words or not self.committed:
+            return words
+        if abs(words[0][0] - self.last_commit_time) > 1.0:
+            return words
+
+        for n in range(min(5, len(self.committed), len(words)), 0, -1):
+            tail = [_normalize_word(w[2]) for w in self.committed[-n:]]
+            head = [_normalize_word(w[2]) for w in words[:n]]
+            if tail == head:
+                return words[n:]
+        return words
+
+    def _decode_final(self, n=None):
+        # Final-tier text of the oldest n buffered samples (all if None)
+        prompt = " ".join(self.final_texts)[-200:] or None
+        audio = self.audio.view()
+        if n is not None:
+            audio = audio[:n] # view(n) would be the newest samples
+        words = self.stt.transcribe_words(audio, initial_prompt=prompt, tier="final")
+        return "".join(w[2] for w in words).strip()
+
+    def _trim_to(self, t):
+        cut = int(round(t * self.sample_rate)) - self.audio.start_index
+        if cut > 0:
+            if self.two_tier:
+                self.final_texts.append(self._decode_final(cut))
+            self.audio.discard(cut)
+
+    def process_iter(self):
+        """Decode the uncommitted tail. Returns (committed_text, tentative_text)."""
+        if len(self.audio) == 0:
+            return self.committed_text(), self.tentative_text()
+
+        words = self._decode()
+
+        # Local agreement: commit the longest prefix shared with the last pass
+        agreed = 0
+        for prev, cur in zip(self.hypothesis, words):
+            if _normalize_word(prev[2]) != _normalize_word(cur[2]):
+                break
+            agreed += 1
+
+        if agreed:
+            self.committed.extend(words[:agreed])
+            self.last_commit_time = words[agreed - 1][1]
+        self.hypothesis = words[agreed:]
+
+        if self.buffer_seconds() > self.max_buffer_seconds:
+            # Very long utterance without agreement: force a segment cut
+            if self.hypothesis:
+                self.committed.extend(self.hypothesis)
+                self.last_commit_time = self.hypothesis[-1][1]
+                self.hypothesis = []
+                self._trim_to(self.last_commit_time)
+            else:
+                self._trim_to(self.buffer_offset + self.buffer_seconds())
+                self.last_commit_time = self.buffer_offset
+        elif self.buffer_seconds() > self.trim_seconds and self.committed:
+            self._trim_to(self.last_commit_time)
+
+        return self.committed_text(), self.tentative_text()
+
+    def finish(self):
+        """Final text for the utterance, reusing everything already committed."""
+        if self.two_tier:
+            # Preview words are not trusted; only the untrimmed rest needs the final model
+            if len(self.audio):
+                self.final_texts.append(self._decode_final())
+            text = " ".join(t for t in self.final_texts if t)
+            self.reset()
+            return text
+
+        if self.audio.written > self.decoded_upto:
+            # New audio since the last pass: decode the tail once more
+            self.hypothesis = self._decode()
+
+        self.committed.extend(self.hypothesis)
+        self.hypothesis = []
+        text = self.committed_text()
+        self.reset()
+        return text
@@ -0,0 +1,91 @@
+import itertools
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+MODEL = "/models/qwen-7b.gguf"
+PROMPT = "Answer briefly."
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Strictly increasing timestamps, so least-recently-used is well defined
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(answer_cache.time, "time", lambda: float(next(ticks)))
+
+def question(i):
+    return f"what is item number {i}"
+
+def test_answers_persist_across_instances(tmp_path):
+    path = str(tmp_path / "answers.db")
+    cache = AnswerCache(path=path)
+    cache.put("What is a closure?", MODEL, PROMPT, "A function with its environment.")
+    assert cache.get("what is a closure", MODEL, PROMPT) == "A function with its environment."
+    cache.close()
+
+    cache = AnswerCache(path=path)
+    assert cache.get("What is a closure?", MODEL, PROMPT) == "A function with its environment."
+    assert (cache.hits, cache.disk_hits) == (1, 1)
+    cache.close()
+
+def test_key_includes_model_and_system_prompt(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.db"))
+    cache.put("What is a closure?", MODEL, PROMPT, "answer")
+    assert cache.get("What is a closure?", "/models/other.gguf", PROMPT) is None
+    assert cache.get("What is a closure?", MODEL, "Answer at length.") is None
+    assert cache.get("What is a closure?", "/elsewhere/qwen-7b.gguf", PROMPT) == "answer" # Same model file
+    cache.close()
+
+def test_short_questions_are_not_cached(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.db"), min_words=3)
+    cache.put("and space?", MODEL, PROMPT, "answer")
+    assert cache.get("and space?", MODEL, PROMPT) is None
+    assert cache.misses == 0 # Not even looked up
+    cache.close()
+
+def test_least_recently_used_rows_are_evicted_from_disk(tmp_path):
+    path = str(tmp_path / "answers.db")
+    cache = AnswerCache(path=path, disk_entries=3)
+    for i in range(3):
+        cache.put(question(i), MODEL, PROMPT, f"answer {i}")
+    cache.close() # Writes the queue
+
+    cache = AnswerCache(path=path, disk_entries=3)
+    assert cache.get(question(0), MODEL, PROMPT) == "answer 0" # Now the most recently used
+    cache.put(question(3), MODEL, PROMPT, "answer 3")
+    cache.close()
+    assert cache.evictions == 1
+
+    cache = AnswerCache(path=path, disk_entries=3)
+    answers = [cache.get(question(i), MODEL, PROMPT) for i in range(4)]
+    assert answers == ["answer 0", None, "answer 2", "answer 3"]
+    cache.close()
+
+def test_memory_lru_is_bounded(tmp_path):
+    path = str(tmp_path / "answers.db")
+    cache = AnswerCache(path=path, memory_entries=2)
+    for i in range(3):
+        cache.put(question(i), MODEL, PROMPT, f"answer {i}")
+    assert len(cache.memory) == 2
+    assert cache.get(question(2), MODEL, PROMPT) == "answer 2"
+    assert cache.disk_hits == 0
+    cache.close()
+
+    cache = AnswerCache(path=path, memory_entries=2)
+    assert cache.get(question(0), MODEL, PROMPT) == "answer 0" # Dropped from memory, not from disk
+    assert cache.disk_hits == 1
+    cache.close()
+
+def test_clear_forgets_everything(tmp_path):
+    path = str(tmp_path / "answers.db")
+    cache = AnswerCache(path=path)
+    cache.put(question(1), MODEL, PROMPT, "answer")
+    cache.close()
+    cache = AnswerCache(path=path)
+    cache.clear()
+    assert cache.get(question(1), MODEL, PROMPT) is None
+    cache.close()
+    cache = AnswerCache(path=path)
+    assert cache.get(question(1), MODEL, PROMPT) is None
+    cache.close()
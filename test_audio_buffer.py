@@ -0,0 +1,91 @@
+import threading
+import time
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer, BlockQueue
+
+def ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+def test_view_is_the_newest_samples_across_the_wrap():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 7))
+    ring.write(ramp(7, 6)) # Wraps and overwrites the 3 oldest
+    assert np.array_equal(ring.view(), ramp(3, 10))
+    assert np.array_equal(ring.view(4), ramp(9, 4))
+    assert (len(ring), ring.written, ring.overruns, ring.start_index) == (10, 13, 3, 3)
+
+def test_view_is_zero_copy():
+    ring = AudioRingBuffer(8)
+    ring.write(ramp(0, 6))
+    ring.write(ramp(6, 5))
+    assert np.shares_memory(ring.view(), ring._data)
+
+def test_block_larger_than_the_ring_keeps_its_newest_part():
+    ring = AudioRingBuffer(4)
+    ring.write(ramp(0, 10))
+    assert np.array_equal(ring.view(), ramp(6, 4))
+    assert ring.written == 10
+
+def test_gain_is_applied_while_copying_in():
+    ring = AudioRingBuffer(8)
+    chunk = ramp(1, 3)
+    ring.write(chunk, gain=2.0)
+    assert np.array_equal(ring.view(), chunk * 2)
+    assert np.array_equal(chunk, ramp(1, 3)) # The caller's block is left alone
+    assert ring.energy() == 4.0
+
+def test_keep_last_and_discard_drop_the_oldest():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 8))
+    ring.keep_last(5)
+    assert np.array_equal(ring.view(), ramp(3, 5))
+    ring.discard(2)
+    assert np.array_equal(ring.view(), ramp(5, 3))
+    assert ring.start_index == 5
+
+def test_drop_oldest_keeps_the_newest_blocks():
+    q = BlockQueue(4, capacity=2)
+    for i in range(4):
+        assert q.put(np.full(4, i, dtype=np.float32), t=float(i))
+    assert (q.overruns, q.dropped_frames) == (2, 8)
+    assert q.get()[0] == 2 and q.held_time == 2.0
+    assert q.get()[0] == 3 and q.held_time == 3.0
+    assert q.get(timeout=0.01) is None
+
+def test_block_policy_waits_for_the_consumer():
+    q = BlockQueue(4, capacity=1, policy="block")
+    q.put(np.zeros(4, dtype=np.float32))
+    done = threading.Event()
+    def producer():
+        q.put(np.ones(4, dtype=np.float32))
+        done.set()
+    threading.Thread(target=producer, daemon=True).start()
+    assert not done.wait(0.05) # Full: the second put waits
+    assert q.get()[0] == 0
+    assert done.wait(1)
+    assert q.get()[0] == 1
+    assert (q.overruns, q.dropped_frames) == (1, 0)
+
+def test_close_ends_the_stream_after_the_queued_blocks():
+    q = BlockQueue(4, capacity=4)
+    q.put(np.ones(4, dtype=np.float32))
+    q.close()
+    assert not q.put(np.ones(4, dtype=np.float32))
+    assert q.get() is not None
+    assert q.get() is None
+
+def test_close_wakes_a_waiting_consumer():
+    q = BlockQueue(4)
+    threading.Timer(0.05, q.close).start()
+    start = time.perf_counter()
+    assert q.get(timeout=5) is None
+    assert time.perf_counter() - start < 1
+
+def test_stereo_blocks_are_downmixed():
+    q = BlockQueue(3)
+    q.put(np.array([[1, 3], [2, 4], [0, 0]], dtype=np.float32))
+    assert np.array_equal(q.get(), [2, 3, 0])
+    q.put(np.array([[5], [6]], dtype=np.float32)) # Short mono block
+    assert np.array_equal(q.get(), [5, 6])
@@ -0,0 +1,28 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+class BrokenMic:
+    name = "broken"
+
+    def recorder(self, samplerate):
+        raise RuntimeError("device unplugged")
+
+@pytest.fixture
+def audio_capture(monkeypatch):
+    # No audio server here: soundcard finds no devices
+    def no_device():
+        raise RuntimeError("no audio server")
+    monkeypatch.setitem(sys.modules, "soundcard", types.SimpleNamespace(default_speaker=no_device))
+    monkeypatch.delitem(sys.modules, "audio_capture", raising=False)
+    return importlib.import_module("audio_capture")
+
+def test_recorder_failure_ends_the_stream(audio_capture):
+    capture = audio_capture.AudioCapture()
+    capture.mic = BrokenMic()
+    capture.start()
+    assert capture.get_audio_chunk() is None # Instead of waiting for stop()
+    assert capture.error == "device unplugged"
+    capture.stop()
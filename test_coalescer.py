@@ -0,0 +1,90 @@
+import queue
+
+import pytest
+
+from coalescer import QuestionCoalescer, normalize_question
+from latency import tracer
+from pipeline import Thinker
+
+@pytest.fixture(autouse=True)
+def no_trace_log():
+    # Keep test utterances out of logs/latency.jsonl
+    enabled, tracer.enabled = tracer.enabled, False
+    yield
+    tracer.enabled = enabled
+
+def test_normalize_drops_case_punctuation_and_fillers():
+    assert normalize_question("Um, so... What IS a heap?") == "what is a heap"
+
+def test_exact_and_fuzzy_repeats_are_dropped():
+    c = QuestionCoalescer()
+    assert c.admit("What is a thread?") == ("What is a thread?", False)
+    assert c.admit("what is a thread") is None
+    assert c.admit("What is a threat?") is None # Misheard repeat
+    assert c.duplicates == 2
+
+def test_retranscribed_part_of_a_question_is_dropped():
+    c = QuestionCoalescer(window=0)
+    c.admit("How do I reverse a linked list in Python?")
+    assert c.admit("reverse a linked list") is None
+
+def test_short_follow_up_is_not_a_duplicate():
+    c = QuestionCoalescer(window=0)
+    c.admit("What is the difference between a process and a thread?")
+    assert c.admit("thread") == ("thread", False)
+
+def test_new_question_within_window_is_not_merged():
+    c = QuestionCoalescer()
+    c.admit("What is the difference between a process and a thread?")
+    assert c.admit("What is a thread?") == ("What is a thread?", False)
+
+def test_fragment_within_window_is_merged():
+    c = QuestionCoalescer()
+    c.admit("How do I reverse a linked list")
+    assert c.admit("in Python?") == ("How do I reverse a linked list in Python?", True)
+    # Counted by the worker, and only if the merge replaced a queued question
+    assert c.merged == 0
+
+def test_fragment_after_a_complete_question_is_not_merged():
+    c = QuestionCoalescer()
+    c.admit("How do I reverse a linked list?")
+    assert c.admit("in Python?") == ("in Python?", False)
+
+def test_fragment_outside_window_is_not_merged():
+    c = QuestionCoalescer(window=0)
+    c.admit("How do I reverse a linked list")
+    assert c.admit("in Python?") == ("in Python?", False)
+
+def test_force_skips_deduplication():
+    c = QuestionCoalescer()
+    c.admit("What is a thread?")
+    assert c.admit("What is a thread?", force=True) == ("What is a thread?", False)
+
+def take(thinker):
+    text, uid, _, _ = thinker._take_newest(thinker.queue.get_nowait())
+    return text, uid
+
+def test_merge_that_replaces_a_queued_question_saves_one_generation():
+    thinker = Thinker(policy="preempt")
+    thinker.add_question("How do I reverse a linked list", uid=1)
+    thinker.add_question("in Python?", uid=2)
+    assert take(thinker) == ("How do I reverse a linked list in Python?", 2)
+    c = thinker.coalescer
+    assert (c.merged, c.superseded, c.generations_saved) == (1, 0, 1)
+
+def test_merge_saves_nothing_when_both_are_answered():
+    thinker = Thinker(policy="queue")
+    thinker.add_question("How do I reverse a linked list", uid=1)
+    thinker.add_question("in Python?", uid=2)
+    assert thinker.queue.qsize() == 2
+    assert thinker.coalescer.generations_saved == 0
+
+def test_newer_question_supersedes_a_queued_one():
+    thinker = Thinker(policy="preempt")
+    thinker.add_question("What is a heap?", uid=1)
+    thinker.add_question("How does quicksort work?", uid=2)
+    assert take(thinker) == ("How does quicksort work?", 2)
+    with pytest.raises(queue.Empty):
+        thinker.queue.get_nowait()
+    c = thinker.coalescer
+    assert (c.merged, c.superseded) == (0, 1)
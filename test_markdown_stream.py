@@ -0,0 +1,61 @@
+import random
+
+from markdown_stream import StreamingMarkdown, block_html, is_plain, render_markdown
+
+ANSWER = """Use a **dict** for lookups:
+
+```python
+counts = {}
+for word in words:
+    counts[word] = counts.get(word, 0) + 1
+```
+Then sort it.
+```
+no language, `inline` ticks
+```
+Done, **really**."""
+
+def stream(chunks):
+    md = StreamingMarkdown()
+    blocks = []
+    for chunk in chunks:
+        blocks += md.feed(chunk)
+        assert md.text[md.block_start:] == md.tail()
+    return blocks + md.finish()
+
+def split(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), 12))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+def code_blocks(blocks):
+    return [b for b in blocks if b[0] == "code"]
+
+def test_any_chunking_renders_like_the_whole_text():
+    whole = stream([ANSWER])
+    expected = "".join(block_html(b) for b in whole)
+    rng = random.Random(0)
+    chunkings = [list(ANSWER)] + [split(ANSWER, rng) for _ in range(50)]
+    for chunks in chunkings:
+        blocks = stream(chunks)
+        assert "".join(block_html(b) for b in blocks) == expected
+        assert code_blocks(blocks) == code_blocks(whole)
+    assert render_markdown(ANSWER) == expected
+
+def test_fence_split_across_chunks():
+    blocks = stream(["a\n`", "``py\nx = 1\n`", "``\nb"])
+    assert blocks == [("text", "a\n"), ("code", "py", "x = 1\n"), ("text", "\n"), ("text", "b")]
+
+def test_text_lines_close_at_newlines():
+    md = StreamingMarkdown()
+    assert md.feed("one\ntw") == [("text", "one\n")]
+    assert md.tail() == "tw"
+    assert md.feed("o\n") == [("text", "two\n")]
+    assert md.finish() == []
+
+def test_unterminated_code_block_is_code():
+    assert stream(["```sh\nls", " -l"]) == [("code", "sh", "ls -l")]
+
+def test_is_plain():
+    assert is_plain(("text", "just words\n"))
+    assert not is_plain(("text", "some **bold**\n"))
+    assert not is_plain(("code", "py", "x = 1"))
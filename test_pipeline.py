@@ -0,0 +1,131 @@
+import sys
+import time
+import types
+
+import numpy as np
+import pytest
+
+import file_capture
+import pipeline
+from file_capture import FileAudioCapture
+from latency import LatencyTracer
+from pipeline import Listener, Pipeline, Thinker
+
+QUESTION = "How do I reverse a linked list"
+
+class FakeSpeechToText:
+    def __init__(self, **kwargs):
+        pass
+
+    def warmup(self):
+        pass
+
+class FakeStreamingTranscriber:
+    # Previews hear `preview`; the final decode is slow, as Whisper's is
+    preview = ""
+    final = QUESTION
+    finishes = 0
+
+    def __init__(self, stt, sample_rate, buffer):
+        pass
+
+    def process_iter(self):
+        return "", ""
+
+    def text(self):
+        return self.preview
+
+    def finish(self):
+        FakeStreamingTranscriber.finishes += 1
+        time.sleep(0.5)
+        return self.final
+
+    def reset(self):
+        pass
+
+class FakeAnswerCache:
+    def __init__(self):
+        self.closed = False
+
+    def print_summary(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class FakeLLM:
+    cancel = False # Answer cut off, as if preempted
+    answer_cache = None
+
+    def __init__(self, model_path, **options):
+        self.session_stats = types.SimpleNamespace(print_summary=lambda: None)
+
+    def warmup(self):
+        pass
+
+    def generate_response(self, text, stream_callback=None, stats_callback=None, should_stop=None, **kwargs):
+        time.sleep(0.2)
+        stream_callback("Walk it once, flipping each next pointer.")
+        stats_callback(types.SimpleNamespace(cancelled=self.cancel, to_dict=dict))
+        return "Walk it once, flipping each next pointer."
+
+    def maybe_summarize(self, should_stop=None):
+        pass
+
+@pytest.fixture
+def stubs(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "stt", types.SimpleNamespace(
+        SpeechToText=FakeSpeechToText, StreamingTranscriber=FakeStreamingTranscriber))
+    monkeypatch.setitem(sys.modules, "llm", types.SimpleNamespace(LLM=FakeLLM))
+    monkeypatch.setattr(pipeline, "tracer", LatencyTracer(path=str(tmp_path / "latency.jsonl")))
+    monkeypatch.setattr(FakeStreamingTranscriber, "finishes", 0)
+    # Half a second of silence, then speech that runs to the end of the file
+    sr = 16000
+    t = np.arange(int(1.5 * sr)) / sr
+    speech = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    audio = np.concatenate([np.zeros(sr // 2, dtype=np.float32), speech])
+    monkeypatch.setattr(file_capture, "load_audio", lambda path, sample_rate: audio)
+
+def run(gap_seconds):
+    source = FileAudioCapture("question.wav", realtime=False, gap_seconds=gap_seconds)
+    p = Pipeline(Listener(vad_backend="energy", audio_source=source), Thinker())
+    events = []
+    p.subscribe(lambda event, *args: events.append((event, args)))
+    p.start()
+    try:
+        p.drain()
+    finally:
+        p.stop()
+    return events
+
+def test_drain_waits_for_the_last_utterance_to_be_answered(stubs):
+    # No silence after the file: the VAD never closes the utterance, the end of stream does
+    events = run(gap_seconds=0.0)
+
+    names = [event for event, _ in events]
+    assert ("utterance_ready", (QUESTION, 1)) in events
+    assert names.index("generation_started") < names.index("response_ready")
+    timings = [args[0] for event, args in events if event == "timings"]
+    assert [(t["id"], t["status"]) for t in timings] == [(1, "ok")]
+
+def test_cancelled_answer_is_reported_as_cancelled(stubs, monkeypatch):
+    monkeypatch.setattr(FakeLLM, "cancel", True)
+    events = run(gap_seconds=0.0)
+
+    assert ("response_ready", ("cancelled",)) in events
+    timings = [args[0] for event, args in events if event == "timings"]
+    assert [t["status"] for t in timings] == ["cancelled"]
+
+def test_answer_cache_is_closed_when_the_thinker_exits(stubs, monkeypatch):
+    monkeypatch.setattr(FakeLLM, "answer_cache", FakeAnswerCache())
+    run(gap_seconds=0.0)
+    assert FakeLLM.answer_cache.closed
+
+def test_question_mark_trigger_does_not_reopen_during_the_hangover(stubs, monkeypatch):
+    # The pause after the speech finds the "?": answered from the preview, once
+    monkeypatch.setattr(FakeStreamingTranscriber, "preview", "What is a heap?")
+    monkeypatch.setattr(FakeStreamingTranscriber, "final", "What is a heap?")
+    events = run(gap_seconds=2.0)
+
+    assert [args for event, args in events if event == "utterance_ready"] == [("What is a heap?", 1)]
+    assert FakeStreamingTranscriber.finishes == 1 # Only the final decode revise() compares against
@@ -0,0 +1,52 @@
+import pytest
+
+from session_store import SessionStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(path=str(tmp_path / "sessions.db"))
+    yield store
+    store.close()
+
+def texts(rows):
+    return [row[2] for row in rows]
+
+def test_search_matches_every_word_as_a_prefix(store):
+    store.add_turn("user", "How do Python decorators work?")
+    store.add_turn("assistant", "A decorator wraps a function.")
+    store.add_turn("user", "What about Rust lifetimes?")
+    store.writer.flush()
+    assert texts(store.search("decorat")) == ["A decorator wraps a function.", "How do Python decorators work?"]
+    assert texts(store.search("python decorator")) == ["How do Python decorators work?"]
+    assert store.search("haskell") == []
+
+def test_newest_matches_first_up_to_the_limit(store):
+    for i in range(5):
+        store.add_turn("user", f"question {i} about caching")
+    store.writer.flush()
+    assert texts(store.search("caching", limit=2)) == ["question 4 about caching", "question 3 about caching"]
+
+def test_fts_syntax_in_the_query_is_literal(store):
+    store.add_turn("user", 'What does "AND" mean in SQL? (NOT a keyword)')
+    store.writer.flush()
+    # Operators, quotes and brackets are searched as words, not parsed
+    for query in ['"AND"', "and", "sql*", "NOT sql", "(not", 'mean "in']:
+        assert len(store.search(query)) == 1, query
+    assert store.search("NOT haskell") == []
+
+def test_empty_query_finds_nothing(store):
+    store.add_turn("user", "anything")
+    store.writer.flush()
+    assert store.search("   ") == []
+
+def test_turns_from_earlier_sessions_are_found(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first = SessionStore(path=path, label="first")
+    first.add_turn("user", "How big is the sun?", timings={"stt_ms": 120})
+    first.close()
+
+    second = SessionStore(path=path, label="second")
+    rows = second.search("sun")
+    assert [(row[0], row[1], row[2]) for row in rows] == [(first.session_id, "user", "How big is the sun?")]
+    assert second.session_id != first.session_id
+    second.close()
@@ -0,0 +1,84 @@
+import importlib
+import sys
+import types
+
+import numpy as np
+import pytest
+
+SAMPLE_RATE = 16000
+WORDS = "she sells sea shells by the shore while seven sailors sing softly under bright stars".split()
+
+def script():
+    # (start, end, word) in absolute seconds: 0.4 s words, 0.1 s apart
+    return [(0.5 * i, 0.5 * i + 0.4, " " + w) for i, w in enumerate(WORDS)]
+
+class ScriptedSTT:
+    """Transcribes whatever part of the script the audio covers.
+
+    A word cut off at the end of the audio comes out truncated, the way a
+    real model guesses at half a word, so it changes from pass to pass.
+    """
+
+    def __init__(self, two_tier=False):
+        self.has_preview_tier = two_tier
+        self.stream = None # The StreamingTranscriber, for the buffer's absolute offset
+        self.decoded = []  # (tier, seconds of audio) per call
+
+    def transcribe_words(self, audio, initial_prompt=None, tier="final"):
+        start = self.stream.buffer_offset
+        end = start + len(audio) / SAMPLE_RATE
+        self.decoded.append((tier, len(audio) / SAMPLE_RATE))
+        words = []
+        for s, e, w in script():
+            if s < start - 0.05 or s >= end:
+                continue
+            if e > end:
+                w = w[:1 + int((len(w) - 1) * (end - s) / (e - s))] # Truncated guess
+            if tier == "final":
+                w = w.upper()
+            words.append((s - start, min(e, end) - start, w))
+        return words
+
+@pytest.fixture
+def stt(monkeypatch):
+    # Neither backend is installed here; StreamingTranscriber only needs the STT interface
+    monkeypatch.setitem(sys.modules, "ctranslate2", types.SimpleNamespace(get_cuda_device_count=lambda: 0))
+    monkeypatch.setitem(sys.modules, "faster_whisper", types.SimpleNamespace(WhisperModel=None))
+    monkeypatch.delitem(sys.modules, "stt", raising=False)
+    return importlib.import_module("stt")
+
+def stream(stt, engine, chunk_seconds=0.3, **kwargs):
+    transcriber = stt.StreamingTranscriber(engine, sample_rate=SAMPLE_RATE, **kwargs)
+    engine.stream = transcriber
+    audio = np.zeros(int((script()[-1][1] + 0.3) * SAMPLE_RATE), dtype=np.float32)
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    passes = []
+    for i in range(0, len(audio), chunk):
+        transcriber.insert_audio(audio[i:i + chunk])
+        passes.append(transcriber.process_iter())
+    return transcriber, passes
+
+def test_only_agreed_words_are_committed(stt):
+    transcriber, passes = stream(stt, ScriptedSTT())
+    sentence = " ".join(WORDS)
+    committed = [c for c, _ in passes]
+    assert committed[-1] # Words were committed while streaming
+    for before, after in zip(committed, committed[1:]):
+        assert after.startswith(before) # Committed text never changes
+    for text in committed:
+        assert sentence.startswith(text) # Truncated guesses are never committed
+    assert transcriber.finish() == sentence
+
+def test_committed_audio_is_trimmed(stt):
+    engine = ScriptedSTT()
+    transcriber, _ = stream(stt, engine, trim_seconds=2.0)
+    assert max(seconds for _, seconds in engine.decoded) < 3.0 # Not the whole 7.7 s
+    assert transcriber.finish() == " ".join(WORDS)
+
+def test_two_tier_finish_returns_the_final_tier(stt):
+    engine = ScriptedSTT(two_tier=True)
+    transcriber, passes = stream(stt, engine, trim_seconds=2.0)
+    assert passes[-1][0] == passes[-1][0].lower() # Previews come from the preview tier
+    assert transcriber.finish() == " ".join(WORDS).upper()
+    # Every stretch of audio went through the final tier once
+    assert sum(seconds for tier, seconds in engine.decoded if tier == "final") == pytest.approx(script()[-1][1] + 0.3, abs=0.01)
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+
+from vad import VAD, EnergyVAD
+
+class LevelVAD(VAD):
+    # Speech wherever the frame is loud: isolates the gating from any detector
+    def frame_speech(self, frames):
+        return np.abs(frames).mean(axis=1) > 0.05
+
+def signal(*parts, sample_rate=16000):
+    # parts: (seconds, amplitude) runs of a 220 Hz tone (amplitude 0 is silence)
+    runs = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        runs.append((amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32))
+    return np.concatenate(runs)
+
+def feed(vad, audio, block_size):
+    events, states = [], []
+    for i in range(0, len(audio), block_size):
+        event = vad.process(audio[i:i + block_size])
+        if event:
+            events.append((event, len(states) + len(vad.frame_states)))
+        states.extend(vad.frame_states)
+    return events, np.array(states)
+
+def test_speech_starts_after_min_speech_and_ends_after_the_hangover():
+    vad = LevelVAD(min_speech_ms=64, hangover_ms=320) # 4 and 20 frames
+    audio = signal((0.512, 0), (1.024, 0.3), (1.024, 0)) # 32, 64 and 64 frames
+    events, states = feed(vad, audio, 256)
+    start, end = 32, 96 # Frames where the tone starts and stops
+    assert events == [("start", start + 4), ("end", end + 20)]
+    assert not states[:start + 3].any()
+    assert states[start + 3:end + 19].all()
+    assert not states[end + 19:].any()
+
+def test_short_blips_and_gaps_are_ignored():
+    vad = LevelVAD(min_speech_ms=64, hangover_ms=320)
+    # A 32 ms click never starts speech; a 160 ms pause does not end it
+    audio = signal((0.5, 0), (0.032, 0.3), (0.5, 0), (0.5, 0.3), (0.16, 0), (0.5, 0.3), (1.0, 0))
+    events, _ = feed(vad, audio, 256)
+    assert [e for e, _ in events] == ["start", "end"]
+
+def test_decisions_do_not_depend_on_the_block_size():
+    audio = signal((0.5, 0), (1.0, 0.3), (0.3, 0), (0.8, 0.2), (1.5, 0))
+    results = [feed(LevelVAD(hangover_ms=500), audio, size) for size in (320, 1000, 4096)]
+    for events, states in results[1:]:
+        assert [e for e, _ in events] == [e for e, _ in results[0][0]]
+        assert np.array_equal(states, results[0][1])
+
+def test_longer_hangover_holds_speech_longer():
+    audio = signal((0.5, 0), (1.0, 0.3), (2.0, 0))
+    short = feed(LevelVAD(hangover_ms=500), audio, 320)[1].sum()
+    long = feed(LevelVAD(hangover_ms=1000), audio, 320)[1].sum()
+    assert long - short == math.ceil(1000 / 16) - math.ceil(500 / 16) # In 16 ms frames
+
+def test_energy_vad_finds_a_tone_in_quiet_noise():
+    rng = np.random.default_rng(0)
+    audio = signal((1.0, 0), (1.0, 0.1), (2.0, 0))
+    audio += rng.normal(0, 0.001, len(audio)).astype(np.float32)
+    events, states = feed(EnergyVAD(), audio, 4096)
+    assert [e for e, _ in events] == ["start", "end"]
+    # The adaptive floor moves per frame, so smaller blocks decide the same
+    for size in (256, 320, 1000):
+        assert np.array_equal(feed(EnergyVAD(), audio, size)[1], states)
@@ -0,0 +1,206 @@
+import numpy as np
+import os
+import math
+import importlib.util
+
+# Force Absolute Path for finding local resources
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# onnxruntime is only imported when the Silero backend is actually created
+HAS_ONNXRUNTIME = importlib.util.find_spec("onnxruntime") is not None
+
+class VAD:
+    """Base voice-activity detector.
+
+    Backends only classify fixed-size frames (frame_speech). This class turns
+    those raw decisions into speech segments: an onset needs min_speech_ms of
+    speech, and a segment only ends after hangover_ms of non-speech.
+    """
+    frame_size = 256
+
+    def __init__(self, sample_rate=16000, min_speech_ms=250, hangover_ms=1000):
+        self.sample_rate = sample_rate
+        frame_ms = 1000.0 * self.frame_size / sample_rate
+        self.min_speech_frames = max(1, math.ceil(min_speech_ms / frame_ms))
+        self.hangover_frames = max(1, math.ceil(hangover_ms / frame_ms))
+        self.reset()
+
+    def reset(self):
+        self.triggered = False
+        self.speech_run = 0
+        self.silence_run = 0
+        # Samples short of a full frame, carried into the next block. Blocks that
+        # do not line up with frames are assembled in _joined, grown (rarely) to fit
+        self._carry = np.zeros(self.frame_size, dtype=np.float32)
+        self._carry_len = 0
+        self._joined = np.zeros(0, dtype=np.float32)
+        self.frame_flags = np.zeros(0, dtype=bool)   # Raw decisions of the last block
+        self.frame_states = np.zeros(0, dtype=bool)  # Gated (in-speech) state of the last block
+
+    def frame_speech(self, frames):
+        # frames: (n, frame_size) float32 -> bool array of length n
+        raise NotImplementedError
+
+    def _frames(self, block):
+        fs = self.frame_size
+        r = self._carry_len
+        total = r + len(block)
+        n = total // fs
+        if r == 0 and total == n * fs:
+            return block.reshape(n, fs) # Lines up with frames: a view, nothing copied
+        if self._joined.size < total:
+            self._joined = np.zeros(total, dtype=np.float32)
+        joined = self._joined[:total]
+        joined[:r] = self._carry[:r]
+        joined[r:] = block
+        # Copied out: block may be a view into a ring that gets overwritten
+        self._carry_len = total - n * fs
+        self._carry[:self._carry_len] = joined[n * fs:]
+        return joined[:n * fs].reshape(n, fs)
+
+    def process(self, block):
+        """Feed one audio block. Returns "start", "end" or None for the block."""
+        was_triggered = self.triggered
+        frames = self._frames(block)
+        flags = self.frame_speech(frames) if len(frames) else np.zeros(0, dtype=bool)
+        states = np.zeros(len(flags), dtype=bool)
+
+        for i, is_speech in enumerate(flags):
+            if not self.triggered:
+                if is_speech:
+                    self.speech_run += 1
+                    if self.speech_run >= self.min_speech_frames:
+                        self.triggered = True
+                        self.silence_run = 0
+                else:
+                    self.speech_run = 0
+            else:
+                if is_speech:
+                    self.silence_run = 0
+                else:
+                    self.silence_run += 1
+                    if self.silence_run >= self.hangover_frames:
+                        self.triggered = False
+                        self.speech_run = 0
+            states[i] = self.triggered
+
+        self.frame_flags = flags
+        self.frame_states = states
+
+        if self.triggered and not was_triggered:
+            return "start"
+        if was_triggered and not self.triggered:
+            return "end"
+        return None
+
+
+class EnergyVAD(VAD):
+    """Energy detector with an adaptive noise floor.
+
+    A frame is speech when its mean |x| is ratio times above the tracked noise
+    floor (and above min_energy). The floor follows quiet frames quickly when
+    the room gets quieter and creeps up slowly under steady noise such as a
+    fan or background music, so those stop triggering after a few seconds.
+    Rates are per frame and applied in the log domain.
+    """
+    frame_size = 256 # 16 ms at 16 kHz
+
+    def __init__(self, sample_rate=16000, ratio=3.0, min_energy=0.0003,
+                 attack=0.2, release=0.003, warmup_ms=500, **kwargs):
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.attack = attack   # Floor update rate when the level drops
+        self.release = release # Floor update rate when the level rises
+        self.warmup_frames = int(warmup_ms * sample_rate / 1000 / self.frame_size)
+        self._scratch = np.zeros(0, dtype=np.float32)
+        super().__init__(sample_rate=sample_rate, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self.noise_floor = self.min_energy / self.ratio # Start at the old fixed threshold
+        self.frames_seen = 0
+
+    def frame_speech(self, frames):
+        if self._scratch.size < frames.size:
+            self._scratch = np.zeros(frames.size, dtype=np.float32)
+        mags = self._scratch[:frames.size].reshape(frames.shape)
+        np.abs(frames, out=mags)
+        energies = mags.mean(axis=1)
+
+        floor_min = self.min_energy / self.ratio
+        if self.frames_seen < self.warmup_frames:
+            # Calibrate on the first few hundred ms: assume the quietest frame is noise
+            self.noise_floor = max(float(energies.min()), floor_min)
+        self.frames_seen += len(energies)
+
+        threshold = max(self.noise_floor * self.ratio, self.min_energy)
+        flags = energies > threshold
+
+        quiet = energies[~flags]
+        if len(quiet):
+            target = float(quiet.mean())
+        else:
+            # Everything looks like speech: let a steady background raise the floor
+            target = float(energies.min())
+        target = max(target, floor_min)
+
+        rate = self.attack if target < self.noise_floor else self.release
+        rate = 1.0 - (1.0 - rate) ** len(energies)
+        self.noise_floor = math.exp(math.log(self.noise_floor) + rate * (math.log(target) - math.log(self.noise_floor)))
+
+        return flags
+
+
+class SileroVAD(VAD):
+    """Silero VAD (v5 ONNX) on CPU. Expects local_models/silero_vad.onnx."""
+    frame_size = 512 # Silero v5 window at 16 kHz
+    context_size = 64
+
+    def __init__(self, sample_rate=16000, model_path=None, threshold=0.5, **kwargs):
+        if not HAS_ONNXRUNTIME:
+            raise ImportError("Please install onnxruntime to use the Silero VAD.")
+        if sample_rate != 16000:
+            raise ValueError("SileroVAD is only wired for 16 kHz audio.")
+
+        if model_path is None:
+            model_path = os.path.join(BASE_DIR, "local_models", "silero_vad.onnx")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Silero VAD model not found at {model_path}")
+
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1 # A single frame is tiny; threads only add overhead
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.threshold = threshold
+        self._sr = np.array(sample_rate, dtype=np.int64)
+        self._input = np.zeros((1, self.context_size + self.frame_size), dtype=np.float32)
+        super().__init__(sample_rate=sample_rate, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._input[...] = 0.0
+
+    def frame_speech(self, frames):
+        flags = np.zeros(len(frames), dtype=bool)
+        x = self._input
+        for i, frame in enumerate(frames):
+            # Slide: last context_size samples of the previous frame + this frame
+            x[0, :self.context_size] = x[0, -self.context_size:]
+            x[0, self.context_size:] = frame
+            prob, self._state = self.session.run(None, {"input": x, "state": self._state, "sr": self._sr})
+            flags[i] = prob[0][0] > self.threshold
+        return flags
+
+
+def create_vad(backend="energy", sample_rate=16000, **kwargs):
+    # kwargs: options shared by all backends (min_speech_ms, hangover_ms)
+    if backend == "silero":
+        try:
+            return SileroVAD(sample_rate=sample_rate, **kwargs)
+        except Exception as e:
+            print(f"[VAD] Silero unavailable ({e}). Falling back to energy VAD.")
+    elif backend != "energy":
+        print(f"[VAD] Unknown backend '{backend}'. Using energy VAD.")
+    return EnergyVAD(sample_rate=sample_rate, **kwargs)